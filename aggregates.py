@@ -0,0 +1,142 @@
+# Running totals kept alongside the ledger so balance/summary reads are O(1)
+#
+# Sums are integer cents (see money.py): adding and removing rows never drifts,
+# so the totals always equal a fresh recount exactly.
+#
+# Every (month, category) cell an add or remove touches is remembered until
+# take_changes() collects it, so forecast.py can update just those cells;
+# `generation` moves on whenever the totals are rebuilt or cleared wholesale.
+from money import cents, to_amount
+
+KINDS = ("income", "expenses")
+
+
+class _KindTotals:
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.month_sums = {}
+        self.month_counts = {}
+        self.category_sums = {}
+        self.month_category_sums = {}  # month -> {category: cents}
+        self.changed = set()           # (month, category) cells touched since take_changes()
+
+    def apply(self, entry, sign):
+        amount = cents(entry["amount"]) * sign
+        month = entry["date"][:7]  # YYYY-MM
+        category = entry.get("category")
+
+        self.total += amount
+        self.count += sign
+        self.month_sums[month] = self.month_sums.get(month, 0) + amount
+        self.month_counts[month] = self.month_counts.get(month, 0) + sign
+        self.category_sums[category] = self.category_sums.get(category, 0) + amount
+        cells = self.month_category_sums.setdefault(month, {})
+        cells[category] = cells.get(category, 0) + amount
+        self.changed.add((month, category))
+
+        if self.month_counts[month] <= 0:
+            del self.month_sums[month], self.month_counts[month], self.month_category_sums[month]
+
+    def load(self, summary):
+        # summary() of a vectorized ledger, in cents
+        self.total = summary["total"]
+        self.count = summary["count"]
+        self.month_sums = dict(summary["month_sums"])
+        self.month_counts = dict(summary["month_counts"])
+        self.category_sums = dict(summary["category_sums"])
+        self.month_category_sums = {m: dict(c) for m, c in summary["month_category_sums"].items()}
+
+    def snapshot(self):
+        return {
+            "total": self.total,
+            "count": self.count,
+            "month_sums": dict(self.month_sums),
+            "month_counts": dict(self.month_counts),
+            "category_sums": dict(self.category_sums),
+            "month_category_sums": {(m, c): s for m, cells in self.month_category_sums.items()
+                                    for c, s in cells.items()},
+        }
+
+
+class RunningTotals:
+    def __init__(self):
+        self._kinds = {kind: _KindTotals() for kind in KINDS}
+        self.generation = 0
+
+    # ─── UPDATES ───────────────────────────────────────────────────────────────
+
+    def add(self, kind, entry):
+        self._kinds[kind].apply(entry, 1)
+
+    def remove(self, kind, entry):
+        self._kinds[kind].apply(entry, -1)
+
+    def clear(self, kind=None):
+        for k in ([kind] if kind else KINDS):
+            self._kinds[k] = _KindTotals()
+        self.generation += 1
+
+    def rebuild(self, income, expenses):
+        self.clear()
+        for kind, entries in zip(KINDS, (income, expenses)):
+            totals = self._kinds[kind]
+            if hasattr(entries, "summary"):
+                totals.load(entries.summary())  # Vectorized ledgers summarize themselves
+                continue
+            for entry in entries:
+                totals.apply(entry, 1)
+            totals.changed.clear()  # Covered by the new generation
+
+    def take_changes(self):
+        # {kind: {(month, category), ...}} touched since the last call
+        changes = {}
+        for kind, totals in self._kinds.items():
+            changes[kind], totals.changed = totals.changed, set()
+        return changes
+
+    # ─── READS ─────────────────────────────────────────────────────────────────
+
+    def total(self, kind):
+        return to_amount(self._kinds[kind].total)
+
+    def total_cents(self, kind):
+        return self._kinds[kind].total
+
+    def count(self, kind):
+        return self._kinds[kind].count
+
+    def monthly_totals(self, kind):
+        return {month: to_amount(s) for month, s in self._kinds[kind].month_sums.items()}
+
+    def monthly_averages(self, kind):
+        totals = self._kinds[kind]
+        return {month: to_amount(s / totals.month_counts[month]) for month, s in totals.month_sums.items()}
+
+    def month_category_cents(self, kind):
+        # {month: {category: cents}}; the live dict, don't modify it
+        return self._kinds[kind].month_category_sums
+
+    def category_totals(self, kind):
+        # Categories whose rows were all deleted drop out of the breakdown
+        return {c: to_amount(s) for c, s in self._kinds[kind].category_sums.items() if s}
+
+    # ─── CONSISTENCY ───────────────────────────────────────────────────────────
+
+    def diff(self, other):
+        # Exact comparison; amounts in the messages are cents
+        problems = []
+        for kind in KINDS:
+            mine, theirs = self._kinds[kind].snapshot(), other._kinds[kind].snapshot()
+            if mine["count"] != theirs["count"]:
+                problems.append(f"{kind} count {mine['count']} != {theirs['count']}")
+            if mine["total"] != theirs["total"]:
+                problems.append(f"{kind} total {mine['total']} != {theirs['total']}")
+            if mine["month_counts"] != theirs["month_counts"]:
+                problems.append(f"{kind} month counts differ")
+            for field in ("month_sums", "category_sums", "month_category_sums"):
+                keys = set(mine[field]) | set(theirs[field])
+                for key in keys:
+                    if mine[field].get(key, 0) != theirs[field].get(key, 0):
+                        problems.append(f"{kind} {field}[{key}] {mine[field].get(key)} != {theirs[field].get(key)}")
+        return problems
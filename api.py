@@ -1,12 +1,24 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import tempfile
+from flask import Flask, Response, request, jsonify, stream_with_context
+from dates import parse_date
 from tracker import BudgetTracker
-from gpt_advisor import analyze_budget, create_budget
+from gpt_advisor import analyze_budget, create_budget, stream_analyze_budget, stream_create_budget
+from importer import SUPPORTED, commit_batch, ledger_keys, new_stats, prepare_statement
+from service import TrackerService
 
 app = Flask(__name__)
 
 # Create a global instance of BudgetTracker
 tracker = BudgetTracker(None)  # Pass `None` since this is not connected to the GUI
-tracker.load_data()
+# Every handler goes through the service's read/write locks. Run several worker
+# processes (gunicorn -w N api:app) only with PENNYPILOT_STORAGE=sqlite.
+# The ledger is loaded by the first request that needs it; PENNYPILOT_PRELOAD=1
+# loads it at startup instead (e.g. with gunicorn --preload).
+service = TrackerService(tracker, loaded=False)
+if os.getenv("PENNYPILOT_PRELOAD") == "1":
+    service.load()
 
 @app.route("/")
 def home():
@@ -21,8 +33,11 @@ def add_income():
     date = data.get("date", None)  # Optional date
     if not amount or not source:
         return jsonify({"error": "Amount and source are required"}), 400
-    tracker.add_income(amount, source, date)
-    return jsonify({"message": "Income added successfully!"})
+    with service.write():
+        entry = tracker.add_income(amount, source, date)
+    if entry is None:
+        return jsonify({"error": "Invalid amount or date"}), 400
+    return jsonify({"message": "Income added successfully!", "id": entry["id"]})
 
 # Add expense
 @app.route("/add_expense", methods=["POST"])
@@ -33,47 +48,226 @@ def add_expense():
     date = data.get("date", None)  # Optional date
     if not amount or not category:
         return jsonify({"error": "Amount and category are required"}), 400
-    tracker.add_expense(amount, category, date)
-    return jsonify({"message": "Expense added successfully!"})
+    with service.write():
+        entry = tracker.add_expense(amount, category, date)
+    if entry is None:
+        return jsonify({"error": "Invalid amount or date"}), 400
+    return jsonify({"message": "Expense added successfully!", "id": entry["id"]})
 
-# View income
+# View income (optional ?start=&end=&category= filters, ?limit=&offset= paging, ?fields= projection)
 @app.route("/view_income", methods=["GET"])
 def view_income():
-    return jsonify({"income": tracker.income})
+    return _list_response("income")
 
-# View expenses
+# View expenses (same parameters as /view_income)
 @app.route("/view_expenses", methods=["GET"])
 def view_expenses():
-    return jsonify({"expenses": tracker.expenses})
+    return _list_response("expenses")
+
+def _conditional(build, missing="Not found"):
+    # Clients sending the current ledger version back in If-None-Match get a 304,
+    # and the body is never rebuilt or serialized
+    with service.read():
+        tag = tracker.ledger_version()  # Read before the data, so a tag is never newer than its body
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+        else:
+            body = build()
+            if body is None:
+                return jsonify({"error": missing}), 404
+            response = jsonify(body)
+    response.set_etag(tag)
+    return response
+
+def _list_response(kind):
+    args = request.args
+    try:
+        offset = max(0, int(args.get("offset", 0)))
+        limit = int(args["limit"]) if args.get("limit") else None
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    for name in ("start", "end"):
+        if args.get(name) and parse_date(args[name]) is None:
+            return jsonify({"error": f"{name} must be a date (YYYY-MM-DD, MM/DD/YYYY or MM/DD/YY)"}), 400
+    fields = [f for f in args.get("fields", "").split(",") if f]
+
+    def build():
+        # One extra row tells us whether there is a next page without counting every match
+        rows = tracker.query(kind, args.get("start"), args.get("end"), args.get("category"),
+                             offset, None if limit is None else limit + 1)
+        more = limit is not None and len(rows) > limit
+        rows = rows[:limit] if more else rows
+        if fields:
+            rows = [{f: row[f] for f in fields if f in row} for row in rows]
+        return {kind: rows, "offset": offset, "limit": limit,
+                "next_offset": offset + limit if more else None}
+
+    return _conditional(build)
+
+# Bulk add: a JSON array or NDJSON stream of {amount, description, date?, category?, classification?}
+@app.route("/transactions/bulk", methods=["POST"])
+def bulk_transactions():
+    rows, errors = _bulk_rows(request.get_data(as_text=True), request.mimetype)
+    if not errors:
+        with service.write():
+            added, errors = tracker.add_transactions(rows)
+            if not errors:
+                tracker.save_data_quietly()  # One storage write for the whole batch
+    if errors:
+        return jsonify({"error": f"{len(errors)} invalid rows; nothing was added",
+                        "errors": errors[:MAX_REPORTED_ERRORS]}), 400
+    return jsonify({"message": f"Added {len(added)} transactions.", "count": len(added),
+                    "ids": [entry["id"] for entry in added]})
+
+MAX_REPORTED_ERRORS = 1000
+
+def _bulk_rows(body, mimetype):
+    # Returns (rows, errors); NDJSON errors are reported per line like validation errors
+    if mimetype == "application/json" or body.lstrip().startswith("["):
+        try:
+            rows = json.loads(body)
+        except json.JSONDecodeError as e:
+            rows = e
+        if not isinstance(rows, list):
+            return [], [{"row": None, "error": f"Expected a JSON array or NDJSON lines ({rows})"}]
+        return rows, []
+    rows, errors = [], []
+    for i, line in enumerate(line for line in body.splitlines() if line.strip()):
+        try:
+            rows.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            errors.append({"row": i, "error": f"Invalid JSON: {e}"})
+    return rows, errors
+
+# Single transaction by id
+@app.route("/transactions/<txn_id>", methods=["GET"])
+def get_transaction(txn_id):
+    def build():
+        kind, entry = tracker.get_transaction(txn_id)
+        return None if entry is None else {"kind": kind, "transaction": entry}
+    return _conditional(build, missing="Transaction not found")
+
+# Edit fields of a transaction (amount, date, source/category, expense_category)
+@app.route("/transactions/<txn_id>", methods=["PATCH"])
+def update_transaction(txn_id):
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict):
+        return jsonify({"error": "Expected a JSON object of fields to change"}), 400
+    with service.write():
+        kind, entry = tracker.get_transaction(txn_id)
+        if entry is not None:
+            entry = tracker.update_transaction(txn_id, fields)
+    if kind is None:
+        return jsonify({"error": "Transaction not found"}), 404
+    if entry is None:
+        return jsonify({"error": "Invalid amount, date or text field"}), 400
+    return jsonify({"kind": kind, "transaction": entry})
+
+# Delete a transaction
+@app.route("/transactions/<txn_id>", methods=["DELETE"])
+def delete_transaction(txn_id):
+    with service.write():
+        deleted = tracker.delete_transaction(txn_id)
+    if not deleted:
+        return jsonify({"error": "Transaction not found"}), 404
+    return jsonify({"message": "Transaction deleted successfully!"})
 
 # View balance
 @app.route("/view_balance", methods=["GET"])
 def view_balance():
-    balance = tracker.view_balance()
-    return jsonify({"balance": balance})
+    return _conditional(lambda: {"balance": tracker.view_balance()})
 
-# Generate budget
+# Next month's balance, income and spending per category
+# (?model=auto|average|smoothing|seasonal; auto picks seasonal given two years of history)
+@app.route("/forecast", methods=["GET"])
+def forecast():
+    model = request.args.get("model", "auto")
+    try:
+        return _conditional(lambda: tracker.forecast(model))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ImportError as e:
+        return jsonify({"error": str(e)}), 501
+
+# Generate budget (?stream=1 or Accept: text/event-stream streams it as server-sent events,
+# ?nocache=1 asks the model again even if this budget was answered before)
 @app.route("/generate_budget", methods=["GET"])
 def generate_budget():
-    budget = create_budget(tracker.income, tracker.expenses)
+    income, expenses = _snapshot()
+    use_cache = request.args.get("nocache") not in ("1", "true")
+    if _wants_stream():
+        return _event_stream(stream_create_budget(income, expenses, use_cache))
+    budget = create_budget(income, expenses, use_cache)
     return jsonify({"budget": budget})
 
-# Analyze budget
+# Analyze budget (same parameters as /generate_budget)
 @app.route("/analyze_budget", methods=["GET"])
 def analyze_budget_api():
-    advice = analyze_budget(tracker.income, tracker.expenses)
+    income, expenses = _snapshot()
+    use_cache = request.args.get("nocache") not in ("1", "true")
+    if _wants_stream():
+        return _event_stream(stream_analyze_budget(income, expenses, use_cache))
+    advice = analyze_budget(income, expenses, use_cache)
     return jsonify({"advice": advice})
 
+def _wants_stream():
+    return request.args.get("stream") in ("1", "true") or "text/event-stream" in request.headers.get("Accept", "")
+
+def _event_stream(chunks):
+    # Each chunk is one "data:" event holding a JSON string (keeps newlines intact);
+    # a final "done" event tells the client the answer is complete
+    def events():
+        for chunk in chunks:
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _snapshot():
+    # Copy under the read lock so slow GPT calls never hold it
+    with service.read():
+        return list(tracker.income), list(tracker.expenses)
+
+# Import a bank statement (multipart upload, field "file")
+@app.route("/import_statement", methods=["POST"])
+def import_statement_api():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "A statement file is required"}), 400
+    ext = os.path.splitext(upload.filename)[1].lower()
+    if ext not in SUPPORTED:
+        return jsonify({"error": f"Unsupported statement type: {ext}"}), 400
+
+    # Parsers stream from disk, so spool the upload to a temp file rather than memory
+    fd, path = tempfile.mkstemp(suffix=ext)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            upload.save(f)
+        # Categorization runs unlocked; only committing a batch takes the write lock
+        with service.read():
+            existing = ledger_keys(tracker)
+        stats = new_stats()
+        for batch in prepare_statement(path, existing, stats):
+            with service.write():
+                commit_batch(tracker, batch, stats)
+    finally:
+        os.remove(path)
+    return jsonify({"message": "Statement imported successfully!", **stats})
+
 # Save data
 @app.route("/save_data", methods=["POST"])
 def save_data():
-    tracker.save_data()
+    with service.write():
+        tracker.save_data()
     return jsonify({"message": "Data saved successfully!"})
 
 # Load data
 @app.route("/load_data", methods=["POST"])
 def load_data():
-    tracker.load_data()
+    with service.write():
+        tracker.load_data()
     return jsonify({"message": "Data loaded successfully!"})
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+# Forecast benchmark: full fit vs incremental updates across many categories
+#
+#   python bench_forecast.py                  # 1000 categories x 10 years
+#   python bench_forecast.py -c 5000 -m 240 -r 20
+#
+# Builds running totals for a synthetic ledger (one transaction per category per
+# month, with a yearly pattern) and times what forecast.Forecaster does for the
+# tracker: the first forecast (a full fit), a repeat with nothing changed, and
+# the forecast after a new transaction this month or an edit in the middle of
+# the history. The last two replay one series, not all of them.
+import argparse
+import random
+import time
+
+from aggregates import RunningTotals
+from forecast import MODELS, Forecaster
+
+
+def build(categories, months):
+    totals = RunningTotals()
+    rng = random.Random(1)
+    for c in range(categories):
+        base, swing = rng.uniform(50, 500), rng.uniform(0, 100)
+        for m in range(months):
+            amount = -round(base + swing * (m % 12 in (10, 11, 0)) + rng.uniform(-20, 20), 2)
+            totals.add("expenses", {"amount": amount, "date": f"{2000 + m // 12}-{m % 12 + 1:02d}-15",
+                                    "category": f"category {c}"})
+    return totals
+
+
+def timed(func, runs):
+    # Best of `runs`, in milliseconds
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time next-month forecasts across many categories.")
+    parser.add_argument("-c", "--categories", type=int, default=1000)
+    parser.add_argument("-m", "--months", type=int, default=120)
+    parser.add_argument("-r", "--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    totals = build(args.categories, args.months)
+    last = f"{2000 + (args.months - 1) // 12}-{(args.months - 1) % 12 + 1:02d}"
+    middle = f"{2000 + args.months // 24}-06"
+    print(f"{args.categories} categories x {args.months} months")
+
+    def full_fit():
+        Forecaster().predict(totals)
+
+    forecaster = Forecaster()
+    forecaster.predict(totals)
+
+    def new_transaction():
+        totals.add("expenses", {"amount": -12.5, "date": f"{last}-20", "category": "category 0"})
+        forecaster.predict(totals)
+
+    def edit_history():
+        totals.add("expenses", {"amount": -12.5, "date": f"{middle}-20", "category": "category 1"})
+        forecaster.predict(totals)
+
+    rows = [("full fit", full_fit),
+            ("nothing changed", lambda: forecaster.predict(totals)),
+            ("new transaction this month", new_transaction),
+            (f"edit in {middle}", edit_history)]
+    rows += [(f"  {model} model", lambda model=model: forecaster.predict(totals, model)) for model in MODELS[1:]]
+    for label, func in rows:
+        print(f"{label:<28} {timed(func, args.runs):>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Startup benchmark: how long each entry point takes to import
+#
+#   python bench_startup.py                # best of 5, fails if over budget
+#   python bench_startup.py -n 10 --top 15 --budget api=150
+#
+# Every module is imported in a fresh interpreter under `python -X importtime`
+# and the cumulative time of the module itself is what counts (interpreter
+# startup is left out). The check fails when a module goes over its budget or
+# pulls in one of the LAZY dependencies, which are loaded on first use only.
+# Timings depend on the machine; the LAZY check doesn't, so it catches most
+# regressions even where the budgets need --scale.
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Milliseconds, with headroom over what a laptop measures
+BUDGETS = {"api": 250, "gui": 300, "importer": 80, "tracker": 40}
+LAZY = ("openai", "httpx", "numpy", "pandas", "fitz", "openpyxl", "tiktoken", "asyncio", "dotenv")
+
+
+def import_times(module):
+    # {module: (self µs, cumulative µs)} for one cold import
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def measure(module, runs):
+    best = None
+    for _ in range(runs):
+        times = import_times(module)
+        if best is None or times[module][1] < best[module][1]:
+            best = times
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of each entry point against a budget.")
+    parser.add_argument("modules", nargs="*", help=f"modules to measure (default: {' '.join(BUDGETS)})")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="runs per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest imports of each module")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="override a budget")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, for slow machines")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        name, ms = item.split("=")
+        budgets[name] = float(ms)
+
+    failed = False
+    print(f"{'module':<12} {'import ms':>9} {'budget':>7}  result")
+    for module in args.modules or list(budgets):
+        try:
+            times = measure(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:<12} {'-':>9} {'-':>7}  skipped ({e})")
+            continue
+        ms = times[module][1] / 1000
+        budget = budgets.get(module)
+        problems = []
+        if budget is not None and ms > budget * args.scale:
+            problems.append("over budget")
+        eager = [name for name in LAZY if name in times]
+        if eager:
+            problems.append(f"imports {', '.join(eager)}")
+        failed = failed or bool(problems)
+        limit = f"{budget * args.scale:.0f}" if budget is not None else "-"
+        print(f"{module:<12} {ms:>9.1f} {limit:>7}  {'; '.join(problems) or 'ok'}")
+        if args.top:
+            slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+            for name, (own, _) in slowest:
+                print(f"    {own / 1000:>7.1f}  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
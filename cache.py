@@ -0,0 +1,144 @@
+# On-disk key/value cache with LRU + TTL eviction, shared by the GPT helpers
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_FILE = os.getenv("PENNYPILOT_CACHE_FILE", "pennypilot_cache.db")
+
+
+class DiskCache:
+    def __init__(self, table, path=CACHE_FILE, max_entries=50000, ttl=None, memory_entries=4096, evict_every=100):
+        if not re.fullmatch(r"\w+", table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.table = table
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl  # Seconds; None keeps entries until evicted by size
+        self.evict_every = evict_every  # Writes between size checks; 1 keeps max_entries exact
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Hot keys are answered from memory; their LRU timestamps reach disk in batches
+        self._memory = OrderedDict()
+        self._memory_entries = memory_entries
+        self._touched = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_used ON {table}(used)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is None:
+                row = self._conn.execute(f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                hit = (json.loads(row[0]), row[1]) if row else None
+            if hit is None or (self.ttl is not None and now - hit[1] > self.ttl):
+                if hit is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self._remember(key, hit)
+            self._touched[key] = now
+            if len(self._touched) >= 256:
+                self._flush_touched()
+            self.hits += 1
+            return hit[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now))
+            self._remember(key, (value, now))
+            self._writes += 1
+            # Trimming needs a COUNT, so only do it every so often
+            if self._writes % self.evict_every == 0:
+                self._flush_touched()
+                self._evict()
+            self._conn.commit()
+
+    def _remember(self, key, hit):
+        self._memory[key] = hit
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_entries:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._memory.pop(key, None)
+        self._touched.pop(key, None)
+        self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                f"UPDATE {self.table} SET used = ? WHERE key = ?", [(t, k) for k, t in self._touched.items()])
+            self._conn.commit()
+            self._touched = {}
+
+    def _evict(self):
+        if self.ttl is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (time.time() - self.ttl,))
+        size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if size > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY used LIMIT ?)", (size - self.max_entries,))
+            self._memory.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_touched()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._memory.clear()
+            self._touched = {}
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+
+# ─── MERCHANT NORMALIZATION ────────────────────────────────────────────────────
+
+_DATE = re.compile(r"\b\d{1,4}[/-]\d{1,2}(?:[/-]\d{2,4})?\b")
+_CARD = re.compile(r"(?:x{2,}|\*{2,}|#)\s*\d+|\bcard\s*(?:ending\s*(?:in)?\s*)?\d{2,}\b")
+_PREFIX = re.compile(r"^(?:pos|debit|credit|purchase|checkcard|recurring|ach|visa|dda|web)\b[\s:-]*")
+_SQUARE = re.compile(r"^(?:sq|tst|pp|paypal|sp)\s*\*\s*")
+_NOISE = {"pos", "purchase", "debit", "card", "store", "str", "ref", "id", "txn", "trx", "inst", "xfer", "pmt"}
+
+
+def normalize_merchant(description):
+    text = str(description or "").lower().strip()
+    text = _DATE.sub(" ", text)
+    text = _CARD.sub(" ", text)
+    for _ in range(3):  # Prefixes stack, e.g. "POS DEBIT PURCHASE"
+        text = _PREFIX.sub("", text).strip()
+    text = _SQUARE.sub("", text)
+    text = re.sub(r"[^a-z0-9&' ]+", " ", text)
+    # Store numbers, terminal ids and amounts all carry digits; merchant names rarely do
+    tokens = [t for t in text.split() if t not in _NOISE and not any(ch.isdigit() for ch in t)]
+    return " ".join(tokens) or text.strip()
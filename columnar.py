@@ -0,0 +1,340 @@
+# Columnar, NumPy-backed ledger
+#
+# Amounts live in an int64 array of cents, dates in datetime64[D] and every text field
+# (source, category, ...) as an int32 code into a per-field vocabulary. Rows are
+# only turned back into dicts when something iterates or indexes the ledger, so
+# api.py and gui.py keep working unchanged. Dicts handed out are copies: mutate
+# the ledger through append/update/delete/clear, not by editing a returned row.
+#
+# Transaction ids are an ordinary text field; because each id is its own
+# vocabulary entry, its code doubles as a key into _id_rows (code -> row), which
+# makes get/update/delete by id O(1) lookups. Deleting only flags the row dead:
+# reads select the live rows without touching the arrays (readers share a lock,
+# so they must not mutate them), and deletes squeeze the arrays in one
+# vectorized pass once dead rows pile up.
+from ledger import new_id
+from money import cents
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only needed for the columnar store
+    np = None
+
+MISSING = -1
+_CHUNK = 4096
+
+
+class ColumnarLedger:
+    def __init__(self, rows=(), capacity=1024):
+        if np is None:
+            raise ImportError("The columnar ledger requires numpy (pip install numpy).")
+        self._n = 0
+        self._cents = np.empty(capacity, dtype=np.int64)
+        self._date = np.empty(capacity, dtype="datetime64[D]")
+        self._codes = {}    # field -> int32 array of vocabulary codes
+        self._vocab = {}    # field -> list of strings
+        self._lookup = {}   # field -> {string: code}
+        self._keys = ["amount", "date"]
+        self._id_rows = np.empty(0, dtype=np.int64)  # id code -> row, -1 once deleted
+        self._dead = np.zeros(capacity, dtype=bool)
+        self._holes = 0
+        self.extend(rows)
+
+    # ─── STORAGE ───────────────────────────────────────────────────────────────
+
+    def _grow(self, needed):
+        capacity = len(self._cents)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._cents = np.resize(self._cents, capacity)
+        self._date = np.resize(self._date, capacity)
+        self._dead = np.resize(self._dead, capacity)
+        for field, codes in self._codes.items():
+            self._codes[field] = np.resize(codes, capacity)
+
+    def _field(self, field):
+        if field not in self._codes:
+            codes = np.full(len(self._cents), MISSING, dtype=np.int32)
+            self._codes[field] = codes
+            self._vocab[field] = []
+            self._lookup[field] = {}
+            self._keys.append(field)
+        return self._codes[field]
+
+    def _encode(self, field, value, create=True):
+        if value is None:
+            return MISSING
+        lookup = self._lookup.get(field, {})
+        code = lookup.get(value)
+        if code is None:
+            if not create:
+                return None
+            self._field(field)
+            lookup = self._lookup[field]
+            code = lookup[value] = len(self._vocab[field])
+            self._vocab[field].append(value)
+        return code
+
+    # ─── LIST INTERFACE ────────────────────────────────────────────────────────
+
+    def __len__(self):
+        return self._n - self._holes
+
+    def __iter__(self):
+        rows = self._positions()
+        for start in range(0, len(rows), _CHUNK):
+            yield from self._materialize(rows[start:start + _CHUNK])
+
+    def __getitem__(self, index):
+        rows = self._positions()
+        if isinstance(index, slice):
+            return self._materialize(rows[index])
+        if index < 0:
+            index += len(rows)
+        if not 0 <= index < len(rows):
+            raise IndexError("ledger index out of range")
+        return self._materialize(rows[index:index + 1])[0]
+
+    def _live(self):
+        # Selects the live rows of any per-row array: a slice unless rows were deleted
+        return slice(0, self._n) if not self._holes else np.flatnonzero(~self._dead[:self._n])
+
+    def _positions(self):
+        return np.arange(self._n)[self._live()]
+
+    def _materialize(self, idx):
+        amounts = (self._cents[idx] / 100).tolist()
+        dates = np.datetime_as_string(self._date[idx], unit="D").tolist()
+        fields = {f: (self._codes[f][idx].tolist(), self._vocab[f]) for f in self._keys[2:]}
+        rows = []
+        for i in range(len(amounts)):
+            row = {"amount": amounts[i], "date": dates[i]}
+            for f, (codes, vocab) in fields.items():
+                if codes[i] != MISSING:
+                    row[f] = vocab[codes[i]]
+            rows.append(row)
+        return rows
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        entries = list(entries)
+        if not entries:
+            return
+        start = self._n
+        self._grow(start + len(entries))
+        end = start + len(entries)
+        self._dead[start:end] = False  # np.resize fills grown arrays with repeats
+        self._cents[start:end] = [cents(e["amount"]) for e in entries]
+        self._date[start:end] = [e["date"] for e in entries]
+        fields = {k for e in entries for k in e if k not in ("amount", "date")}
+        for field in fields:
+            self._field(field)
+        for field in self._keys[2:]:
+            self._codes[field][start:end] = [self._encode(field, e.get(field)) for e in entries]
+        self._n = end
+        if "id" in self._codes:
+            self._index_ids(start, end)
+
+    def _index_ids(self, start, end):
+        codes = self._codes["id"][start:end]
+        vocab = len(self._vocab["id"])
+        if vocab > len(self._id_rows):
+            grown = np.full(max(vocab, 2 * len(self._id_rows)), -1, dtype=np.int64)
+            grown[:len(self._id_rows)] = self._id_rows
+            self._id_rows = grown
+        present = codes != MISSING
+        self._id_rows[codes[present]] = np.arange(start, end)[present]
+
+    def _match(self, entry):
+        mask = (self._cents[:self._n] == cents(entry["amount"])) & (self._date[:self._n] == np.datetime64(entry["date"], "D"))
+        mask &= ~self._dead[:self._n]
+        for field in self._keys[2:]:
+            code = self._encode(field, entry.get(field), create=False)
+            if code is None:
+                return np.zeros(self._n, dtype=bool)
+            mask &= self._codes[field][:self._n] == code
+        extra = set(entry) - set(self._keys)
+        if extra:
+            return np.zeros(self._n, dtype=bool)
+        return mask
+
+    def remove(self, entry):
+        if entry.get("id") is not None and self._row(entry["id"]) is not None:
+            self.delete(entry["id"])
+            return
+        hits = np.flatnonzero(self._match(entry))
+        if not len(hits):
+            raise ValueError("entry not in ledger")
+        self._drop(hits[0])
+
+    def _drop(self, i):
+        if "id" in self._codes and self._codes["id"][i] != MISSING:
+            self._id_rows[self._codes["id"][i]] = -1
+        self._dead[i] = True
+        self._holes += 1
+        if self._holes > 1024 and self._holes * 2 > self._n:
+            self._compact()
+
+    def _compact(self):
+        if not self._holes:
+            return
+        n = self._n
+        keep = ~self._dead[:n]
+        m = n - self._holes
+        for arr in (self._cents, self._date, *self._codes.values()):
+            arr[:m] = arr[:n][keep]
+        self._dead[:n] = False
+        self._n, self._holes = m, 0
+        if "id" in self._codes:
+            self._index_ids(0, m)
+
+    def clear(self):
+        self._n = 0
+        self._holes = 0
+        self._dead[:] = False
+        self._id_rows[:] = -1
+
+    # ─── ID INDEX ──────────────────────────────────────────────────────────────
+
+    def _row(self, txn_id):
+        code = self._lookup.get("id", {}).get(txn_id)
+        if code is None or code >= len(self._id_rows) or self._id_rows[code] < 0:
+            return None
+        return int(self._id_rows[code])
+
+    def ensure_ids(self):
+        self._compact()
+        codes = self._field("id")
+        missing = np.flatnonzero(codes[:self._n] == MISSING)
+        for i in missing.tolist():
+            codes[i] = self._encode("id", new_id())
+        if len(missing):
+            self._index_ids(0, self._n)
+        return len(missing)
+
+    def get(self, txn_id):
+        i = self._row(txn_id)
+        return None if i is None else self._materialize(np.array([i]))[0]
+
+    def update(self, txn_id, fields):
+        i = self._row(txn_id)
+        if i is None:
+            return None
+        old = self._materialize(np.array([i]))[0]
+        for field, value in fields.items():
+            if field == "amount":
+                self._cents[i] = cents(value)
+            elif field == "date":
+                self._date[i] = np.datetime64(value, "D")
+            elif field != "id":
+                self._field(field)[i] = self._encode(field, value)
+        return old, self._materialize(np.array([i]))[0]
+
+    def delete(self, txn_id):
+        i = self._row(txn_id)
+        if i is None:
+            return None
+        entry = self._materialize(np.array([i]))[0]
+        self._drop(i)
+        return entry
+
+    # ─── VECTORIZED ANALYTICS ──────────────────────────────────────────────────
+
+    def query(self, start=None, end=None, category=None, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        if not (start or end or category):
+            return self._materialize(self._positions()[offset:stop])
+        mask = ~self._dead[:self._n]
+        dates = self._date[:self._n]
+        if start:
+            mask &= dates >= np.datetime64(start, "D")
+        if end:
+            mask &= dates <= np.datetime64(end, "D")
+        if category:
+            code = self._encode("category", category, create=False)
+            if code is None:
+                return []
+            mask &= self._codes["category"][:self._n] == code
+        return self._materialize(np.flatnonzero(mask)[offset:stop])
+
+    def _total_cents(self):
+        return int(self._cents[self._live()].sum())
+
+    def total(self):
+        return self._total_cents() / 100
+
+    def _group_cents(self, groups, count):
+        # Per-group sums of cents. bincount only adds float64 weights, which hold
+        # integers exactly up to 2**53 cents, far beyond any ledger's totals.
+        return np.bincount(groups, weights=self._cents[self._live()], minlength=count).astype(np.int64)
+
+    def _by_month(self):
+        labels, inverse = self._month_groups()
+        sums = self._group_cents(inverse, len(labels))
+        counts = np.bincount(inverse, minlength=len(labels))
+        return labels, sums, counts
+
+    def _month_groups(self):
+        # (YYYY-MM labels, each live row's index into them)
+        months = self._date[self._live()].astype("datetime64[M]")
+        keys, inverse = np.unique(months, return_inverse=True)
+        return np.datetime_as_string(keys, unit="M").tolist(), inverse
+
+    def _category_groups(self):
+        # (category names, each live row's index into them); rows without one map to a trailing None
+        vocab = self._vocab.get("category", [])
+        if "category" not in self._codes:
+            return [None], np.zeros(len(self), dtype=np.int64)
+        codes = self._codes["category"][self._live()]
+        return vocab + [None], np.where(codes == MISSING, len(vocab), codes)
+
+    def monthly_averages(self):
+        labels, sums, counts = self._by_month()
+        return dict(zip(labels, (sums / counts / 100).tolist()))
+
+    def _category_cents(self):
+        if "category" not in self._codes or not len(self):
+            return {}
+        codes = self._codes["category"][self._live()]
+        vocab = self._vocab["category"]
+        # Rows without a category are counted in an extra group at the end
+        sums = self._group_cents(np.where(codes == MISSING, len(vocab), codes), len(vocab) + 1).tolist()
+        totals = {vocab[c]: s for c, s in enumerate(sums[:-1]) if s}
+        if (codes == MISSING).any():
+            totals[None] = sums[-1]
+        return totals
+
+    def _month_category_cents(self):
+        # {month: {category: cents}} from one bincount over (month, category) pairs
+        if not len(self):
+            return {}
+        months, month_rows = self._month_groups()
+        categories, category_rows = self._category_groups()
+        width = len(categories)
+        sums = self._group_cents(month_rows * width + category_rows, len(months) * width).reshape(len(months), width)
+        cells = {}
+        for m, c in zip(*(i.tolist() for i in np.nonzero(sums))):
+            cells.setdefault(months[m], {})[categories[c]] = int(sums[m, c])
+        return cells
+
+    def category_totals(self):
+        return {c: s / 100 for c, s in self._category_cents().items()}
+
+    def summary(self):
+        # Everything RunningTotals needs (sums in cents), computed in a handful of array passes
+        labels, sums, counts = self._by_month()
+        return {
+            "total": self._total_cents(),
+            "count": len(self),
+            "month_sums": dict(zip(labels, sums.tolist())),
+            "month_counts": dict(zip(labels, counts.tolist())),
+            "category_sums": self._category_cents(),
+            "month_category_sums": self._month_category_cents(),
+        }
+
+    def nbytes(self):
+        return self._cents.nbytes + self._date.nbytes + self._dead.nbytes + sum(c.nbytes for c in self._codes.values())
@@ -0,0 +1,106 @@
+# Date parsing for ledger rows and statements; every result is YYYY-MM-DD
+#
+# Each format is a compiled regex whose groups are the year, month and day, so a
+# string is checked with one match per format instead of a strptime call (and a
+# raised ValueError) per format. Results are memoized: statements and ledgers
+# repeat the same few hundred dates.
+#
+# A statement sticks to one format, so DateParser detects it from a sample of the
+# file and tries it first. Detection can also pick a day-first format, which a
+# lone date is never parsed with (12/03/2024 is March 12th unless the file says
+# otherwise).
+import re
+from datetime import date
+from functools import lru_cache
+
+# format -> (regex, index of the year, month and day groups)
+_FORMATS = {
+    "%Y-%m-%d": (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"), 0, 1, 2),
+    "%m/%d/%Y": (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), 2, 0, 1),
+    "%m/%d/%y": (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{2})"), 2, 0, 1),  # PDF statements
+    "%d/%m/%Y": (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), 2, 1, 0),
+    "%d/%m/%y": (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{2})"), 2, 1, 0),
+}
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y")
+DAY_FIRST = {"%m/%d/%Y": "%d/%m/%Y", "%m/%d/%y": "%d/%m/%y"}
+DETECTABLE_FORMATS = DATE_FORMATS + tuple(DAY_FIRST.values())
+SAMPLE_SIZE = 200
+
+
+def _convert(fmt, text):
+    pattern, y, m, d = _FORMATS[fmt]
+    match = pattern.fullmatch(text)
+    if match is None:
+        return None
+    groups = match.groups()
+    year, month, day = int(groups[y]), int(groups[m]), int(groups[d])
+    if len(groups[y]) == 2:
+        year += 2000 if year < 69 else 1900  # strptime's %y pivot
+    try:
+        date(year, month, day)  # Rejects 02/30 and friends
+    except ValueError:
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+@lru_cache(maxsize=8192)
+def _parse(text, formats):
+    for fmt in formats:
+        result = _convert(fmt, text)
+        if result:
+            return result
+    return None
+
+
+def parse_date(value, formats=DATE_FORMATS):
+    # Returns YYYY-MM-DD, or None if the value isn't a date in one of `formats`
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return _parse(str(value).strip(), tuple(formats))
+
+
+def detect_format(samples, formats=DETECTABLE_FORMATS):
+    # The format that parses the most samples; ties go to the earlier format
+    samples = [str(s).strip() for s in samples if s]
+    best, best_count = None, 0
+    for fmt in formats:
+        count = sum(1 for s in samples if _parse(s, (fmt,)))
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+class DateParser:
+    # One per input file or batch. The format is detected from the first values
+    # seen, then tried ahead of the defaults for every value after.
+    def __init__(self, formats=DATE_FORMATS):
+        self.formats = tuple(formats)
+        self.format = None
+
+    def detect(self, samples):
+        self.format = detect_format(samples)
+        if self.format in DAY_FIRST.values():
+            # A day-first file is day-first whatever the year length
+            self.formats = tuple(DAY_FIRST.get(f, f) for f in self.formats)
+        if self.format:
+            self.formats = (self.format,) + tuple(f for f in self.formats if f != self.format)
+        return self.format
+
+    def parse(self, value):
+        return parse_date(value, self.formats)
+
+    def parse_many(self, values):
+        # Validates a whole column: detects the format on the first call, then parses
+        # each distinct value once. None for missing or invalid values.
+        values = list(values)
+        if self.format is None:
+            self.detect(values[:SAMPLE_SIZE])
+        seen = {}
+        results = []
+        for value in values:
+            if value not in seen:
+                seen[value] = self.parse(value) if value else None
+            results.append(seen[value])
+        return results
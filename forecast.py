@@ -0,0 +1,224 @@
+# Next-month forecasts from the running totals' per-month, per-category sums
+#
+# Every (kind, category) pair is one row of a series x months matrix of cents,
+# with months that have no transactions as zeros, so each model runs on all
+# series at once:
+#
+#   average    mean of the last WINDOW months
+#   smoothing  simple exponential smoothing (a level only)
+#   seasonal   additive Holt-Winters without a trend: the level plus an offset
+#              per month of the year, seeded from the series' first full year
+#
+# "auto" is seasonal once there are two full years of history, smoothing before.
+#
+# The smoothing models keep their state for every month, so a change replays
+# only the series it touched, and only from the month it touched: a new
+# transaction this month is one vectorized step for one row, not a refit.
+# A series starts at its first month with data; zeros before it aren't history.
+import sys
+import threading
+
+from aggregates import KINDS
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only needed for forecasting
+    np = None
+
+MODELS = ("auto", "average", "smoothing", "seasonal")
+WINDOW = 3
+SEASON = 12
+ALPHA = 0.5  # Level smoothing: weight of the latest month
+GAMMA = 0.3  # Seasonal smoothing: weight of the latest year's offset
+
+
+def _ordinal(month):
+    return int(month[:4]) * 12 + int(month[5:7]) - 1
+
+
+def _label(ordinal):
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+class Forecaster:
+    def __init__(self, alpha=ALPHA, gamma=GAMMA, window=WINDOW):
+        if np is None:
+            raise ImportError("Forecasting requires numpy (pip install numpy).")
+        self.alpha, self.gamma, self.window = alpha, gamma, window
+        self._lock = threading.Lock()
+        self._generation = None
+        self._reset(0, 0)
+
+    def _reset(self, start, months):
+        self._start = start       # Ordinal of column 0
+        self._months = months     # Columns in use
+        self._series = []         # Row -> (kind, category)
+        self._rows = {}           # (kind, category) -> row
+        self._values = None
+        self._alloc(16, max(months, 16))
+
+    def _alloc(self, rows, cols):
+        # Grows the per-series arrays to at least rows x cols (doubling), keeping their contents
+        old = self._values
+        if old is None:
+            shape = (rows, cols)
+        elif rows <= old.shape[0] and cols <= old.shape[1]:
+            return
+        else:
+            shape = tuple(have if size <= have else max(size, 2 * have) for size, have in zip((rows, cols), old.shape))
+        for name in ("_values", "_level", "_seasonal_level", "_season"):
+            grown = np.zeros(shape)
+            if old is not None:
+                grown[:old.shape[0], :old.shape[1]] = getattr(self, name)
+            setattr(self, name, grown)
+        for name in ("_first", "_stale"):  # First month with data; first month whose state is out of date
+            grown = np.zeros(shape[0], dtype=np.int64)
+            if old is not None:
+                grown[:old.shape[0]] = getattr(self, name)
+            setattr(self, name, grown)
+
+    # ─── UPDATES ───────────────────────────────────────────────────────────────
+
+    def sync(self, totals):
+        # Brings the matrix and the model state up to date with `totals`
+        changes = totals.take_changes()
+        if totals.generation != self._generation or not self._months:
+            self._rebuild(totals)  # Also when empty: there is no first month to place changes after
+            return
+        cells = [(kind, month, category) for kind, touched in changes.items() for month, category in touched]
+        if any(_ordinal(month) < self._start for _, month, _ in cells):
+            self._rebuild(totals)  # Backdated before the first month; shift everything
+            return
+        for kind, month, category in cells:
+            self._set(kind, category, month, totals.month_category_cents(kind).get(month, {}).get(category, 0))
+        edges = self._values[:len(self._series), [0, self._months - 1]] if self._months else None
+        if edges is not None and not (edges[:, 0].any() and edges[:, 1].any()):
+            self._rebuild(totals)  # The first or last month emptied, so the range shrinks
+            return
+        self._fit()
+
+    def _rebuild(self, totals):
+        self._generation = totals.generation
+        series, rows, cols, values = {}, [], [], []
+        for kind in KINDS:
+            for month, categories in totals.month_category_cents(kind).items():
+                col = _ordinal(month)
+                for category, value in categories.items():
+                    if value:
+                        rows.append(series.setdefault((kind, category), len(series)))
+                        cols.append(col)
+                        values.append(value)
+        start = min(cols, default=0)
+        self._reset(start, max(cols) - start + 1 if cols else 0)
+        self._rows, self._series = series, list(series)
+        self._alloc(len(series), self._months)
+        self._values[rows, np.array(cols, dtype=np.int64) - start] = values
+        self._fit()  # Every row is stale from month 0
+
+    def _set(self, kind, category, month, value):
+        row = self._rows.get((kind, category))
+        if row is None and not value:
+            return
+        col = _ordinal(month) - self._start
+        if col >= self._months:
+            # Every series steps into the new months, with or without data in them
+            n = len(self._series)
+            self._alloc(n, col + 1)
+            self._stale[:n] = np.minimum(self._stale[:n], self._months)
+            self._months = col + 1
+        if row is None:
+            # Zeros so far, which is just what its freshly zeroed state says
+            row = self._rows[kind, category] = len(self._series)
+            self._series.append((kind, category))
+            self._alloc(row + 1, self._months)
+            self._stale[row] = col
+        self._values[row, col] = value
+        self._stale[row] = min(self._stale[row], col)
+
+    def _fit(self):
+        # Replays the smoothing recursions for stale rows, from their earliest stale month
+        n, months = len(self._series), self._months
+        rows = np.flatnonzero(self._stale[:n] < months)
+        if not len(rows):
+            return
+        start = int(self._stale[rows].min())
+        y = self._values[rows, :months]
+        nonzero = y != 0
+        first = np.where(nonzero.any(axis=1), nonzero.argmax(axis=1), months)
+        level, seasonal_level, season = self._level[rows], self._seasonal_level[rows], self._season[rows]
+        a, g = self.alpha, self.gamma
+        for t in range(start, months):
+            y_t, new = y[:, t], first == t
+            previous = level[:, t - 1] if t else 0.0
+            level[:, t] = np.where(new, y_t, a * y_t + (1 - a) * previous)
+            offset = season[:, t - SEASON] if t >= SEASON else 0.0
+            previous = seasonal_level[:, t - 1] if t else 0.0
+            seasonal_level[:, t] = np.where(new, y_t, a * (y_t - offset) + (1 - a) * previous)
+            season[:, t] = np.where(new, 0.0, g * (y_t - seasonal_level[:, t]) + (1 - g) * offset)
+            done = np.flatnonzero(first == t - SEASON + 1)
+            if len(done):
+                # A series' first full year seeds its offsets: each month's distance from the year's mean
+                year = y[done, t - SEASON + 1:t + 1]
+                mean = year.mean(axis=1)
+                season[done, t - SEASON + 1:t + 1] = year - mean[:, None]
+                seasonal_level[done, t] = mean
+        self._level[rows], self._seasonal_level[rows], self._season[rows] = level, seasonal_level, season
+        self._first[rows] = first
+        self._stale[rows] = months
+
+    # ─── FORECASTS ─────────────────────────────────────────────────────────────
+
+    def predict(self, totals, model="auto"):
+        # {"month", "model", "income": {category: cents}, "expenses": {...}} for the
+        # month after the last one with data; month is None for an empty ledger
+        if model not in MODELS:
+            raise ValueError(f"Unknown forecast model: {model} (choose from {', '.join(MODELS)})")
+        with self._lock:
+            self.sync(totals)
+            n, months = len(self._series), self._months
+            if model == "auto":
+                model = "seasonal" if months >= 2 * SEASON else "smoothing"
+            result = {"month": _label(self._start + months) if months else None, "model": model}
+            result.update({kind: {} for kind in KINDS})
+            if not months:
+                return result
+            first = self._first[:n]
+            if model == "average":
+                span = np.clip(months - first, 1, self.window)
+                predicted = self._values[:n, max(0, months - self.window):months].sum(axis=1) / span
+            elif model == "smoothing":
+                predicted = self._level[:n, months - 1]
+            else:
+                predicted = self._seasonal_level[:n, months - 1].copy()
+                if months >= SEASON:
+                    predicted += self._season[:n, months - SEASON]
+            for (kind, category), value, active in zip(self._series, predicted.tolist(), (first < months).tolist()):
+                if active:
+                    result[kind][category] = value
+            return result
+
+
+if __name__ == "__main__":
+    # python forecast.py [auto|average|smoothing|seasonal]
+    from tracker import BudgetTracker
+
+    model = sys.argv[1] if len(sys.argv) > 1 else "auto"
+    if model not in MODELS:
+        print(f"Usage: python forecast.py [{'|'.join(MODELS)}]")
+        sys.exit(1)
+    tracker = BudgetTracker(None)
+    tracker.load_data()
+    forecast = tracker.forecast(model)
+    if forecast["month"] is None:
+        print("Nothing to forecast from yet.")
+        sys.exit(0)
+    print(f"Forecast for {forecast['month']} ({forecast['model']} model)")
+    print(f"  Income:   ${forecast['income']:>12,.2f}")
+    print(f"  Expenses: ${forecast['expenses']:>12,.2f}")
+    print(f"  Balance:  ${forecast['balance']:>12,.2f} (now ${forecast['current_balance']:,.2f})")
+    for kind in KINDS:
+        categories = sorted(forecast["categories"][kind].items(), key=lambda item: -abs(item[1]))
+        if categories:
+            print(f"  {kind.capitalize()} by category:")
+            for category, amount in categories:
+                print(f"    {category:<24} ${amount:>12,.2f}")
@@ -1,76 +1,324 @@
 # Handles all gpt calls and responses
 import os
-import openai
-from dotenv import load_dotenv
-from openai import AuthenticationError, RateLimitError, APIConnectionError, OpenAIError
-import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from cache import DiskCache, normalize_merchant
+from local_classifier import get_local_classifier
+from prompts import MODEL, clean, completion_budget, count_tokens, fit_rows
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# ─── CLIENT ────────────────────────────────────────────────────────────────────
 
-# Function to call OpenAI API and get a response
-def get_gpt_advice(prompt):
+# One client per process: its httpx pool keeps connections alive across calls, every
+# call has a deadline, and retries are ours (_with_backoff) rather than the SDK's.
+# OPENAI_BASE_URL points it at a local mock server (see mock_openai.py).
+OPENAI_TIMEOUT = float(os.getenv("PENNYPILOT_OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("PENNYPILOT_OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_POOL_SIZE = int(os.getenv("PENNYPILOT_OPENAI_POOL_SIZE", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("PENNYPILOT_OPENAI_MAX_RETRIES", "3"))
+BREAKER_THRESHOLD = int(os.getenv("PENNYPILOT_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("PENNYPILOT_BREAKER_COOLDOWN", "30"))
+
+_client = None
+_client_lock = threading.Lock()
+
+# The SDK takes longer to import than the rest of the app put together, so it is
+# loaded by the first call that needs it (creating the client, or matching one of
+# its errors) and importing this module stays cheap
+def _openai():
+    import openai
+    return openai
+
+def _transient_errors():
+    # Failures that say the service is unhealthy (timeouts count as connection errors)
+    openai = _openai()
+    return (openai.APIConnectionError, openai.InternalServerError)
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from dotenv import load_dotenv
+                load_dotenv()  # .env holds the API key (and OPENAI_BASE_URL); read it only when a client is made
+                import httpx  # Installed with openai
+                timeout = httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+                http_client = httpx.Client(
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=OPENAI_POOL_SIZE,
+                                        max_keepalive_connections=OPENAI_POOL_SIZE, keepalive_expiry=60))
+                _client = _openai().OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=timeout, max_retries=0,
+                                        http_client=http_client)
+    return _client
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, retry_in):
+        super().__init__(f"OpenAI calls paused after repeated failures; retrying in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive transient failures and fails fast while open.
+    # Once `cooldown` has passed a single trial call goes through: success closes
+    # the circuit, failure opens it for another cooldown.
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial:
+                raise CircuitOpenError(max(remaining, 0))
+            self._trial = True
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self._failures, self._opened_at, self._trial = 0, None, False
+                return
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                self._opened_at, self._trial = time.monotonic(), False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self._trial else "open"
+
+breaker = CircuitBreaker()
+
+def _call(create, **kwargs):
+    breaker.before_call()
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful financial advisor."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=min(512, 4096 - len(prompt.split())) * 2,  # Rough estimate of token count
-            temperature=0.7,
-        )
-        return (response.choices[0].message.content.strip())
-    except AuthenticationError:
+        result = create(**kwargs)
+    except _transient_errors():
+        breaker.record(False)
+        raise
+    except Exception:
+        breaker.record(True)  # e.g. a bad key: the service itself answered
+        raise
+    breaker.record(True)
+    return result
+
+# ─── PROMPTS ───────────────────────────────────────────────────────────────────
+
+# Reply budgets (max_tokens) per task; categorization sizes its own from the
+# category names, see _category_max_tokens
+DEFAULT_MAX_TOKENS = 512
+ADVICE_MAX_TOKENS = 700
+BUDGET_MAX_TOKENS = 900
+# Prompt tokens allowed for the per-category and per-month breakdowns
+BREAKDOWN_TOKENS = int(os.getenv("PENNYPILOT_BREAKDOWN_TOKENS", "600"))
+
+def _completion_args(prompt, max_tokens=DEFAULT_MAX_TOKENS):
+    messages = [
+        {"role": "system", "content": "You are a helpful financial advisor."},
+        {"role": "user", "content": clean(prompt)}
+    ]
+    return dict(model=MODEL, messages=messages, max_tokens=completion_budget(messages, max_tokens), temperature=0.7)
+
+# Raw completion call; raises OpenAI errors so callers can decide how to retry
+def _chat_completion(prompt, max_tokens=DEFAULT_MAX_TOKENS):
+    response = _call(get_client().chat.completions.create, **_completion_args(prompt, max_tokens))
+    return response.choices[0].message.content.strip()
+
+# Streaming completion; yields text as the model produces it. Only opening the
+# stream is retried, since a half-delivered answer can't be taken back.
+def _chat_completion_stream(prompt, max_tokens=DEFAULT_MAX_TOKENS):
+    args = _completion_args(prompt, max_tokens)
+    stream = _with_backoff(lambda: _call(get_client().chat.completions.create, **args, stream=True),
+                           max_retries=OPENAI_MAX_RETRIES)
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except _transient_errors():
+        breaker.record(False)
+        raise
+    finally:
+        stream.close()  # Also runs when the consumer stops early, releasing the connection
+
+def _error_message(error):
+    openai = _openai()
+    if isinstance(error, CircuitOpenError):
+        print(f"Error: {error}")
+        return f"Service unavailable: {error}."
+    if isinstance(error, openai.AuthenticationError):
         print("Error: Invalid API key. Please check your OpenAI API key in the .env file.")
         return "Authentication error: Invalid API key."
-    except RateLimitError:
+    if isinstance(error, openai.RateLimitError):
         print("Error: Rate limit exceeded. Please wait and try again later.")
         return "Rate limit error: Too many requests. Please try again later."
-    except APIConnectionError:
+    if isinstance(error, openai.APITimeoutError):
+        print(f"Error: The OpenAI API did not answer within {OPENAI_TIMEOUT:.0f}s.")
+        return "Timeout error: OpenAI took too long to respond. Please try again later."
+    if isinstance(error, openai.APIConnectionError):
         print("Error: Failed to connect to the OpenAI API. Please check your internet connection.")
         return "Connection error: Unable to connect to OpenAI servers."
-    except OpenAIError as e:
-        print(f"An OpenAI-specific error occurred: {e}")
-        return f"OpenAI error: {e}"
+    if isinstance(error, openai.OpenAIError):
+        print(f"An OpenAI-specific error occurred: {error}")
+        return f"OpenAI error: {error}"
+    print(f"An unexpected error occurred: {error}")
+    return "An unexpected error occurred. Please try again later."
+
+# ─── RESPONSE CACHE ────────────────────────────────────────────────────────────
+
+# Advice prompts are fully determined by the ledger totals, so an unchanged budget
+# is answered from disk. Keys hash the whole request (prompt, model, parameters).
+RESPONSE_TTL = float(os.getenv("PENNYPILOT_RESPONSE_TTL", 24 * 3600))
+RESPONSE_CACHE_SIZE = int(os.getenv("PENNYPILOT_RESPONSE_CACHE_SIZE", "500"))
+
+_response_cache = None
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = DiskCache("responses", max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_TTL,
+                                    memory_entries=64, evict_every=1)
+    return _response_cache
+
+def response_cache_stats():
+    return get_response_cache().stats()
+
+def _response_key(prompt, max_tokens):
+    request = json.dumps(_completion_args(prompt, max_tokens), sort_keys=True)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+# Function to call OpenAI API and get a response
+def get_gpt_advice(prompt, use_cache=False, max_tokens=DEFAULT_MAX_TOKENS):
+    key = _response_key(prompt, max_tokens) if use_cache else None
+    if key:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return cached
+    try:
+        advice = _with_backoff(_chat_completion, prompt, max_tokens, max_retries=OPENAI_MAX_RETRIES)
+    except Exception as e:
+        return _error_message(e)  # Errors are never cached
+    if key and advice:
+        get_response_cache().set(key, advice)
+    return advice
+
+# Same as get_gpt_advice, but yields the response piece by piece; errors arrive as a final chunk
+def stream_gpt_advice(prompt, use_cache=False, max_tokens=DEFAULT_MAX_TOKENS):
+    key = _response_key(prompt, max_tokens) if use_cache else None
+    if key:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    try:
+        for text in _chat_completion_stream(prompt, max_tokens):
+            if not parts:
+                text = text.lstrip()
+            parts.append(text)
+            yield text
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return "An unexpected error occurred. Please try again later."
+        yield ("\n\n" if parts else "") + _error_message(e)
+        return
+    # Only a stream that ran to the end is stored; an abandoned one raises GeneratorExit above
+    advice = "".join(parts).strip()
+    if key and advice:
+        get_response_cache().set(key, advice)
+
+def analyze_budget(income, expenses, use_cache=True):
+    # Get advice from GPT
+    advice = get_gpt_advice(_analysis_prompt(income, expenses), use_cache, ADVICE_MAX_TOKENS)
+
+    if advice:
+        return advice
+    else:
+        return "Could not retrieve advice from GPT."
+
+def stream_analyze_budget(income, expenses, use_cache=True):
+    return stream_gpt_advice(_analysis_prompt(income, expenses), use_cache, ADVICE_MAX_TOKENS)
+
+def _breakdowns(income, expenses, budget=BREAKDOWN_TOKENS):
+    # Spending by category (largest first) and cash flow by month (newest first),
+    # each trimmed to half the token budget with the remainder summarized
+    categories, months = {}, {}
+    for entry in expenses:
+        category = entry.get("expense_category") or entry.get("category") or "other"
+        categories[category] = categories.get(category, 0.0) + entry["amount"]
+    for kind, entries in (("income", income), ("expenses", expenses)):
+        for entry in entries:
+            month = months.setdefault(entry["date"][:7], {"income": 0.0, "expenses": 0.0})
+            month[kind] += entry["amount"]
+
+    def month_line(row):
+        month, sums = row
+        return f"- {month}: income ${sums['income']:.2f}, expenses ${abs(sums['expenses']):.2f}"
 
-def analyze_budget(income, expenses):
+    def earlier_months(rest):
+        return (f"- {len(rest)} earlier months: average income ${sum(m['income'] for _, m in rest) / len(rest):.2f}, "
+                f"expenses ${abs(sum(m['expenses'] for _, m in rest)) / len(rest):.2f}")
+
+    category_lines = fit_rows(sorted(categories.items(), key=lambda row: row[1]),
+                              lambda row: f"- {row[0]}: ${abs(row[1]):.2f}",
+                              lambda rest: f"- {len(rest)} other categories: ${abs(sum(a for _, a in rest)):.2f}",
+                              budget // 2)
+    used = sum(count_tokens(line) + 1 for line in category_lines)
+    month_lines = fit_rows(sorted(months.items(), reverse=True), month_line, earlier_months, budget - used)
+    sections = ""
+    if category_lines:
+        sections += "\nSpending by Category:\n" + "\n".join(category_lines) + "\n"
+    if month_lines:
+        sections += "\nBy Month (newest first):\n" + "\n".join(month_lines) + "\n"
+    return sections
+
+def _analysis_prompt(income, expenses):
     total_income = sum(item["amount"] for item in income)
     total_expenses = sum(item["amount"] for item in expenses)
 
-    # Prepare the prompt for GPT
-    prompt = f"""
+    # Prepare the prompt for GPT; the breakdowns sit between two clean()ed halves
+    # because interpolating them would defeat the dedent
+    return clean(f"""
     You are a certified financial advisor evaluating a user's monthly budget.
 
     User's Financial Data:
     - Total Monthly Income: ${total_income:.2f}
     - Total Monthly Expenses: ${total_expenses:.2f}
-
+    """) + "\n" + _breakdowns(income, expenses) + "\n" + clean("""
     Instructions:
     1. Analyze whether the user has a surplus or deficit, and state how much.
     2. Suggest three clear, actionable strategies to reduce expenses or manage spending more effectively.
     3. Optionally provide high-level tips for building long-term financial health (e.g., emergency funds, debt payoff strategies).
+    4. Where category or monthly figures are given, point out the ones that stand out.
 
     Format the response using section titles and bullet points where helpful. Use an informative yet friendly tone.
-    """
-    
-    # Get advice from GPT
-    advice = get_gpt_advice(prompt)
-    
-    if advice:
-        return advice
-    else:
-        return "Could not retrieve advice from GPT."
-    
-def create_budget(income, expenses):
+    """)
+
+def create_budget(income, expenses, use_cache=True):
+    # Get the budget from GPT
+    try:
+        budget = get_gpt_advice(_budget_prompt(income, expenses), use_cache, BUDGET_MAX_TOKENS)
+        return budget
+    except Exception as e:
+        print(f"Error creating budget: {e}")
+        return "Could not generate a budget at this time."
+
+def stream_create_budget(income, expenses, use_cache=True):
+    return stream_gpt_advice(_budget_prompt(income, expenses), use_cache, BUDGET_MAX_TOKENS)
+
+def _budget_prompt(income, expenses):
     total_income = sum(item["amount"] for item in income)
     total_expenses = sum(item["amount"] for item in expenses)
 
     # Prepare the prompt for GPT
-    prompt = f"""
+    return f"""
     You are a financial advisor helping a user structure a smart, sustainable monthly budget.
 
     User's Current Situation:
@@ -97,16 +345,35 @@ def create_budget(income, expenses):
     Respond clearly and concisely with bullet points under each section.
     """
 
-    # Get the budget from GPT
-    try:
-        budget = get_gpt_advice(prompt)
-        return budget
-    except Exception as e:
-        print(f"Error creating budget: {e}")
-        return "Could not generate a budget at this time."
-    
-def categorize_transaction(description):
-    prompt = f"""
+VALID_CATEGORIES = [
+    "food", "groceries", "gas", "utilities", "entertainment", "salary",
+    "shopping", "travel", "fees", "health", "gifts", "transfer", "education",
+    "family", "other"
+]
+
+_category_cache = None
+
+def get_category_cache():
+    # Categories for a merchant don't change, so entries only age out after 90 days
+    global _category_cache
+    if _category_cache is None:
+        _category_cache = DiskCache("categories", ttl=90 * 24 * 3600)
+    return _category_cache
+
+def category_cache_stats():
+    return get_category_cache().stats()
+
+@lru_cache(maxsize=None)
+def _category_max_tokens():
+    # The longest category name, plus one for a stray space or newline
+    return max(count_tokens(category) for category in VALID_CATEGORIES) + 1
+
+def _packed_max_tokens(count):
+    # '"12": "groceries", ' per item, plus the braces
+    return count * (_category_max_tokens() + 6) + 2
+
+def _categorization_prompt(description):
+    return f"""
     You are a machine-learning-based financial transaction categorizer.
 
     Instructions:
@@ -120,37 +387,148 @@ def categorize_transaction(description):
 
     Respond with a single word from the list.
     """
-    result = get_gpt_advice(prompt).strip().lower()
-    valid_categories = [
-        "food", "groceries", "gas", "utilities", "entertainment", "salary",
-        "shopping", "travel", "fees", "health", "gifts", "transfer", "education",
-        "family", "other"
-    ]
-    return result if result in valid_categories else "other"
 
-async def async_categorize_transaction(description):
-    prompt = f"""
-    You are a machine-learning-based financial transaction categorizer.
+def _categorize_locally(description):
+    # Offline fast path: keyword rules, then the model trained on the user's ledger
+    return get_local_classifier(VALID_CATEGORIES).classify(description)
 
-        Instructions:
-        - Match the transaction description to the most relevant category.
-        - Choose only one from this list (lowercase): 
-        ["food", "groceries", "gas", "utilities", "entertainment", "salary", "shopping", "travel", "fees", "health", "gifts", "transfer", "education", "family", "other"]
-        - Output ONLY the matching category with no punctuation, quotes, or explanation.
+def categorize_transaction(description, use_local=True):
+    cache = get_category_cache()
+    key = normalize_merchant(description)
+    cached = cache.get(key)
+    if cached:
+        return cached
+    if use_local:
+        local = _categorize_locally(description)
+        if local:
+            return local
 
-        Transaction description:
-        "{description}"
+    result = get_gpt_advice(_categorization_prompt(description), max_tokens=_category_max_tokens()).strip().lower()
+    if result not in VALID_CATEGORIES:
+        return "other"  # Don't cache error strings or off-list answers
+    cache.set(key, result)
+    get_local_classifier(VALID_CATEGORIES).learn(description, result)
+    return result
 
-        Respond with a single word from the list.
-        """
+async def async_categorize_transaction(description):
+    import asyncio  # Already loaded by whoever runs the event loop; not worth 20ms for everyone else
     try:
-        result = get_gpt_advice(prompt).strip().lower()
-        # If GPT returns weird stuff, fallback
-        return result        
+        # get_gpt_advice blocks, so run it off the event loop
+        return await asyncio.to_thread(categorize_transaction, description)
     except Exception as e:
         print(f"Async categorize error: {e}")
         return "other"
 
+# ─── BATCH CATEGORIZATION ──────────────────────────────────────────────────────
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        delay = float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return delay if math.isfinite(delay) and delay >= 0 else None
+
+def _with_backoff(func, *args, max_retries=5, base_delay=1.0, max_delay=30.0):
+    # An open circuit (CircuitOpenError) is not retried: failing fast is the point
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args)
+        except (_openai().RateLimitError, *_transient_errors()) as e:
+            if attempt == max_retries:
+                raise
+            # Honour the server's Retry-After (up to max_delay), otherwise full-jitter exponential backoff
+            delay = _retry_after(e) or random.uniform(0, base_delay * 2 ** attempt)
+            time.sleep(min(delay, max_delay))
+
+def _categorize_uncached(description, max_retries):
+    try:
+        result = _with_backoff(_chat_completion, _categorization_prompt(description), _category_max_tokens(),
+                               max_retries=max_retries)
+    except Exception as e:
+        print(f"Batch categorize error: {e}")
+        return None
+    result = result.strip().lower()
+    return result if result in VALID_CATEGORIES else None
+
+def _packed_categorization_prompt(descriptions):
+    items = "\n    ".join(f"{i}. {json.dumps(str(d))}" for i, d in enumerate(descriptions, 1))
+    return f"""
+    You are a machine-learning-based financial transaction categorizer.
+
+    Instructions:
+    - Match each numbered transaction description to the most relevant category.
+    - Choose only from this list (lowercase):
+    {json.dumps(VALID_CATEGORIES)}
+    - Respond with ONLY a JSON object mapping each item number to its category, e.g. {{"1": "food", "2": "gas"}}.
+
+    Transaction descriptions:
+    {items}
+    """
+
+def _parse_packed_response(text, count):
+    # Returns one category (or None if missing/invalid) per item
+    start, end = text.find("{"), text.rfind("}")
+    try:
+        data = json.loads(text[start:end + 1]) if start != -1 else {}
+    except json.JSONDecodeError:
+        data = {}
+    results = []
+    for i in range(1, count + 1):
+        value = str(data.get(str(i), "")).strip().lower() if isinstance(data, dict) else ""
+        results.append(value if value in VALID_CATEGORIES else None)
+    return results
+
+def _categorize_chunk(descriptions, max_retries):
+    if len(descriptions) == 1:
+        return [_categorize_uncached(descriptions[0], max_retries)]
+    try:
+        text = _with_backoff(_chat_completion, _packed_categorization_prompt(descriptions),
+                             _packed_max_tokens(len(descriptions)), max_retries=max_retries)
+        results = _parse_packed_response(text, len(descriptions))
+    except Exception as e:
+        print(f"Batch categorize error: {e}")
+        results = [None] * len(descriptions)
+    # Only the items the model skipped or mangled get their own request
+    return [r if r is not None else _categorize_uncached(d, max_retries) for d, r in zip(descriptions, results)]
+
+def categorize_transactions(descriptions, max_workers=8, max_retries=5, progress=None, items_per_prompt=1,
+                            use_local=True):
+    # Categorize many descriptions at once; returns categories in input order.
+    # items_per_prompt > 1 packs several descriptions into each request.
+    cache = get_category_cache()
+    keys = [normalize_merchant(d) for d in descriptions]
+    resolved = {}
+    pending = {}
+    for key, description in zip(keys, descriptions):
+        if key in resolved or key in pending:
+            continue
+        cached = cache.get(key) or (_categorize_locally(description) if use_local else None)
+        if cached:
+            resolved[key] = cached
+        else:
+            pending[key] = description
 
+    if pending:
+        size = max(1, items_per_prompt)
+        items = list(pending.items())
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [(chunk, pool.submit(_categorize_chunk, [d for _, d in chunk], max_retries)) for chunk in chunks]
+            done = 0
+            for chunk, future in futures:
+                for (key, description), result in zip(chunk, future.result()):
+                    if result is not None:
+                        cache.set(key, result)
+                        get_local_classifier(VALID_CATEGORIES).learn(description, result)
+                    resolved[key] = result or "other"
+                done += len(chunk)
+                if progress:
+                    progress(done, len(items))
 
+    return [resolved[key] for key in keys]
 
+async def async_categorize_transactions(descriptions, max_workers=8, items_per_prompt=1):
+    import asyncio
+    return await asyncio.to_thread(categorize_transactions, descriptions, max_workers,
+                                   items_per_prompt=items_per_prompt)
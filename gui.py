@@ -1,15 +1,16 @@
-import sys, csv, os
-import pandas as pd
+import sys
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QPushButton, QLabel, QTextEdit, QDialog, QLineEdit, QFileDialog, QMessageBox,
-    QTableWidget, QTableWidgetItem
+    QTableView, QListView, QAbstractItemView, QProgressDialog
 )
-from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont, QTextCursor
 from tracker import BudgetTracker
-from gpt_advisor import analyze_budget, create_budget, async_categorize_transaction
-import asyncio
-import re
+from gpt_advisor import stream_analyze_budget, stream_create_budget
+from importer import commit_batch, ledger_keys, new_stats, prepare_statement
+from transaction_model import LedgerLogModel, TransactionFilterProxy, TransactionTableModel
+from workers import Worker, WorkerPool
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -17,8 +18,10 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Penny Pilot")
         self.setFixedSize(700, 700)
 
-        self.tracker = BudgetTracker(None)
+        self.log_models = {}
+        self.tracker = BudgetTracker(self)  # Ledger changes come back through on_ledger_changed
         self.tracker.load_data()
+        self.workers = WorkerPool()
 
         central = QWidget()
         self.setCentralWidget(central)
@@ -29,10 +32,10 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(title)
 
         logs = QHBoxLayout()
-        self.income_text = QTextEdit(); self.income_text.setReadOnly(True)
-        self.expense_text = QTextEdit(); self.expense_text.setReadOnly(True)
-        logs.addWidget(self._wrap_group("Income", self.income_text))
-        logs.addWidget(self._wrap_group("Expenses", self.expense_text))
+        self.income_list = self._log_view("income")
+        self.expense_list = self._log_view("expenses")
+        logs.addWidget(self._wrap_group("Income", self.income_list))
+        logs.addWidget(self._wrap_group("Expenses", self.expense_list))
         main_layout.addLayout(logs)
 
         buttons = QGridLayout()
@@ -40,17 +43,16 @@ class MainWindow(QMainWindow):
         self._add_button(buttons, "Add Expense", self.add_expense_dialog, 0, 1)
         self._add_button(buttons, "View Summary", self.view_summary, 0, 2)
         self._add_button(buttons, "Save Data", self.tracker.save_data, 1, 0)
-        self._add_button(buttons, "Load Data", lambda: (self.tracker.load_data(), self.update_logs()), 1, 1)
+        self._add_button(buttons, "Load Data", self.tracker.load_data, 1, 1)
         self._add_button(buttons, "Get GPT Advice", self.get_gpt_advice, 1, 2)
         self._add_button(buttons, "Clear Data", self.clear_data, 2, 0)
         self._add_button(buttons, "Generate Budget", self.generate_budget, 2, 1)
         self._add_button(buttons, "Upload Statement", self.upload_statement, 2, 2)
         self._add_button(buttons, "Manage Transactions", self.manage_transactions, 3, 0)
-        self._add_button(buttons, "Exit", self.close, 3, 1, 1, 2)
+        self._add_button(buttons, "Forecast", self.forecast, 3, 1)
+        self._add_button(buttons, "Exit", self.close, 3, 2)
         main_layout.addLayout(buttons)
 
-        self.update_logs()
-
     def _wrap_group(self, label, widget):
         wrapper = QWidget(); layout = QVBoxLayout(wrapper)
         layout.addWidget(QLabel(label)); layout.addWidget(widget)
@@ -60,12 +62,23 @@ class MainWindow(QMainWindow):
         btn = QPushButton(text); btn.clicked.connect(func)
         layout.addWidget(btn, row, col, rowspan, colspan)
 
-    def update_logs(self):
-        self.income_text.clear(); self.expense_text.clear()
-        for i in self.tracker.income:
-            self.income_text.append(f"{i['date']}: ${i['amount']} ({i['source']})")
-        for e in self.tracker.expenses:
-            self.expense_text.append(f"{e['date']}: ${e['amount']} ({e['category']})")
+    def _log_view(self, kind):
+        # Only the visible lines are ever formatted or painted
+        view = QListView()
+        view.setUniformItemSizes(True)
+        view.setLayoutMode(QListView.Batched)  # Otherwise scrollToBottom lays out every row
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        model = self.log_models[kind] = LedgerLogModel(self.tracker, kind, view)
+        view.setModel(model)
+        model.rowsInserted.connect(view.scrollToBottom)
+        view.scrollToBottom()
+        return view
+
+    def on_ledger_changed(self, op, kind, entry):
+        # Called by the tracker after every mutation; only a load rebuilds the panes
+        for k, model in self.log_models.items():
+            if kind is None or k == kind:
+                model.apply(op, entry)
 
     def add_income_dialog(self):
         self._data_dialog("Add Income", ["Amount", "Source", "Date"], self.tracker.add_income)
@@ -81,7 +94,7 @@ class MainWindow(QMainWindow):
         def submit():
             try:
                 handler(*(e.text() for e in entries))
-                self.update_logs(); dlg.accept()
+                dlg.accept()
             except Exception as e:
                 QMessageBox.warning(self, "Error", str(e))
         submit_btn.clicked.connect(submit); dlg.exec()
@@ -90,96 +103,105 @@ class MainWindow(QMainWindow):
         i = self.tracker.view_income(); e = self.tracker.view_expense(); b = self.tracker.view_balance()
         QMessageBox.information(self, "Summary", f"Income: ${i:.2f}\\nExpenses: ${e:.2f}\\nBalance: ${b:.2f}")
 
+    def forecast(self):
+        try:
+            f = self.tracker.forecast()
+        except ImportError as e:
+            QMessageBox.warning(self, "Forecast", str(e))
+            return
+        if f["month"] is None:
+            QMessageBox.information(self, "Forecast", "Add some transactions to forecast from.")
+            return
+        lines = [f"{f['month']} ({f['model']} model)", "",
+                 f"Income: ${f['income']:.2f}", f"Expenses: ${f['expenses']:.2f}",
+                 f"Balance: ${f['balance']:.2f} (now ${f['current_balance']:.2f})"]
+        top = sorted(f["categories"]["expenses"].items(), key=lambda item: -abs(item[1]))[:5]
+        if top:
+            lines += ["", "Largest expenses:"] + [f"  {category}: ${amount:.2f}" for category, amount in top]
+        QMessageBox.information(self, "Forecast", "\n".join(lines))
+
     def clear_data(self):
-        self.tracker.income.clear(); self.tracker.expenses.clear(); self.update_logs()
+        self.tracker.clear_data()
         QMessageBox.information(self, "Cleared", "All data cleared.")
 
     def get_gpt_advice(self):
-        dlg = QDialog(self); dlg.setWindowTitle("GPT Advice")
-        layout = QVBoxLayout(dlg)
-        text = QTextEdit(); text.setReadOnly(True)
-        text.setPlainText(analyze_budget(self.tracker.income, self.tracker.expenses))
-        layout.addWidget(text); layout.addWidget(QPushButton("Close", clicked=dlg.accept))
-        dlg.exec()
+        self._gpt_dialog("GPT Advice", stream_analyze_budget)
 
     def generate_budget(self):
-        dlg = QDialog(self); dlg.setWindowTitle("Generated Budget")
+        self._gpt_dialog("Generated Budget", stream_create_budget)
+
+    def _gpt_dialog(self, title, stream_fn):
+        dlg = QDialog(self); dlg.setWindowTitle(title)
         layout = QVBoxLayout(dlg)
         text = QTextEdit(); text.setReadOnly(True)
-        text.setPlainText(create_budget(self.tracker.income, self.tracker.expenses))
+        text.setPlainText("Thinking...")
         layout.addWidget(text); layout.addWidget(QPushButton("Close", clicked=dlg.accept))
+
+        def consume(income, expenses, progress, cancel):
+            received = False
+            for chunk in stream_fn(income, expenses):
+                if cancel():
+                    break  # Closing the generator also closes the HTTP stream
+                progress(chunk)
+                received = True
+            return received
+
+        waiting = [True]
+        def on_chunk(chunk):
+            # Text arrives a few tokens at a time; append without re-laying out the document
+            if waiting[0]:
+                text.clear(); waiting[0] = False
+            cursor = text.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(chunk)
+
+        # Snapshot the ledger so the worker never reads rows the UI is changing
+        worker = Worker(consume, list(self.tracker.income), list(self.tracker.expenses), controls=True)
+        worker.signals.progress.connect(on_chunk)
+        worker.signals.result.connect(lambda received: received or text.setPlainText("Could not retrieve advice from GPT."))
+        worker.signals.error.connect(lambda msg: text.setPlainText(f"Error: {msg}"))
+        dlg.finished.connect(worker.cancel)
+        self.workers.start(worker)
         dlg.exec()
 
     def upload_statement(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Open Statement", "", "CSV Files (*.csv);;Excel Files (*.xlsx)")
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Open Statement", "", "Statements (*.csv *.xlsx *.pdf);;CSV Files (*.csv);;Excel Files (*.xlsx);;PDF Files (*.pdf)")
         if not path: return
-        try:
-            if path.endswith(".csv"):
-                with open(path, newline='') as f:
-                    for row in csv.DictReader(f):
-                        self._process_row(row.get("Description"), row.get("Amount"))
-            elif path.endswith(".xlsx"):
-                df = pd.read_excel(path)
-                for _, row in df.iterrows():
-                    self._process_row(row.get("Description"), row.get("Amount"))
-            elif path.endswith(".pdf"):
-                import fitz  # PyMuPDF
-                doc = fitz.open(path)
-                text = ""
-                for page in doc:
-                    text += page.get_text()
-
-                lines = text.splitlines()
-                temp_date = None
-                temp_description_lines = []
-
-                AMOUNT_REGEX = re.compile(r"^-?\\$?\\d[\\d,]*\\.\\d{2}$")
-                DATE_REGEX = re.compile(r"^\\d{2}/\\d{2}/(\\d{2}|\\d{4})$")
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    if DATE_REGEX.match(line):
-                        temp_date = line
-                        temp_description_lines = []
-
-                    elif AMOUNT_REGEX.match(line):
-                        if temp_date and temp_description_lines:
-                            description = " ".join(temp_description_lines)
-                            amount = line.replace("$", "").replace(",", "")
-                            try:
-                                amount = float(amount)
-                                classification = "income" if amount > 0 else "expense"
-                                category = asyncio.run(async_categorize_transaction(description))
-                                self.tracker.add_transaction(description, amount, classification, temp_date, category)
-                            except:
-                                continue
-                        temp_date = None
-                        temp_description_lines = []
-
-                    else:
-                        temp_description_lines.append(line)
-
-                self.update_logs()
-                QMessageBox.information(self, "Uploaded", "PDF transactions imported.")
-            self.update_logs()
-            QMessageBox.information(self, "Uploaded", "Transactions imported.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-
-    def _process_row(self, desc, amt):
-        if not desc or not amt: return
-        try:
-            amt = float(amt.replace("$", "").replace(",", ""))
-            classification = "income" if amt > 0 else "expense"
-            loop = asyncio.new_event_loop(); asyncio.set_event_loop(loop)
-            category = loop.run_until_complete(async_categorize_transaction(desc))
-            date = "2024-01-01"
-            self.tracker.add_transaction(desc, amt, classification, date, category)
-        except Exception as e:
-            print("Row error:", e)
+
+        stats = new_stats()
+        progress_dlg = QProgressDialog("Importing statement...", "Cancel", 0, 0, self)
+        progress_dlg.setWindowTitle("Upload Statement")
+        progress_dlg.setMinimumDuration(0)
+
+        def prepare(progress, cancel):
+            # Parsing and categorization run here; batches are committed on the UI thread
+            for batch in prepare_statement(path, existing, stats, cancel=cancel):
+                progress(batch)
+            return stats
+
+        def on_batch(batch):
+            commit_batch(self.tracker, batch, stats)
+            progress_dlg.setLabelText(f"Imported {stats['imported']} transactions...")
+
+        def on_done(result):
+            progress_dlg.reset()
+            QMessageBox.information(
+                self, "Uploaded",
+                f"Imported {result['imported']} transactions ({result['duplicates']} duplicates, {result['skipped']} skipped).")
+
+        def on_error(message):
+            progress_dlg.reset()
+            QMessageBox.critical(self, "Error", message)
+
+        existing = ledger_keys(self.tracker)
+        worker = Worker(prepare, controls=True)
+        worker.signals.progress.connect(on_batch)
+        worker.signals.result.connect(on_done)
+        worker.signals.error.connect(on_error)
+        progress_dlg.canceled.connect(worker.cancel)
+        progress_dlg.show()
+        self.workers.start(worker)
 
     def manage_transactions(self):
         dlg = QDialog(self)
@@ -187,47 +209,38 @@ class MainWindow(QMainWindow):
         dlg.resize(700, 400)
         layout = QVBoxLayout(dlg)
 
-        table = QTableWidget()
-        transactions = self.tracker.load_transactions()
-        table.setRowCount(len(transactions))
-        table.setColumnCount(4)
-        table.setHorizontalHeaderLabels(["Date", "Description", "Amount", "Category"])
-
-        for i, t in enumerate(transactions):
-            table.setItem(i, 0, QTableWidgetItem(t["date"]))
-            table.setItem(i, 1, QTableWidgetItem(t["description"]))
-            table.setItem(i, 2, QTableWidgetItem(str(t["amount"])))
-            table.setItem(i, 3, QTableWidgetItem(t["category"]))
-
+        model = TransactionTableModel(self.tracker, dlg)
+        proxy = TransactionFilterProxy(dlg)
+        proxy.setSourceModel(model)
+
+        search = QLineEdit(placeholderText="Filter transactions...")
+        # Filtering walks every row, so wait for the user to stop typing
+        filter_timer = QTimer(dlg); filter_timer.setSingleShot(True); filter_timer.setInterval(250)
+        filter_timer.timeout.connect(lambda: proxy.set_filter_text(search.text()))
+        search.textChanged.connect(filter_timer.start)
+        layout.addWidget(search)
+
+        table = QTableView()
+        table.setModel(proxy)
+        # Keep ledger order until a header is clicked; enabling sorting would otherwise sort column 0
+        table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        table.setSortingEnabled(True)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        table.verticalHeader().setDefaultSectionSize(22)
         layout.addWidget(table)
 
         # Delete Button
         def delete_selected():
-            selected = table.currentRow()
-            if selected < 0:
+            selected = table.currentIndex()
+            if not selected.isValid():
                 QMessageBox.warning(dlg, "No Selection", "Please select a row to delete.")
                 return
 
-            txn = transactions[selected]
-            # Attempt to remove from income or expenses
-            found = False
-            for lst in [self.tracker.income, self.tracker.expenses]:
-                for entry in lst:
-                    if (
-                        entry["amount"] == txn["amount"]
-                        and entry["date"] == txn["date"]
-                        and entry.get("source", entry.get("category")) == txn["description"]
-                    ):
-                        lst.remove(entry)
-                        found = True
-                        break
-                if found:
-                    break
-
-            if found:
+            _, entry = model.transaction(proxy.mapToSource(selected).row())
+            if self.tracker.delete_transaction(entry["id"]):
                 self.tracker.save_data_quietly()
-                self.update_logs()
-                table.removeRow(selected)
+                model.refresh()
                 QMessageBox.information(dlg, "Deleted", "Transaction removed.")
             else:
                 QMessageBox.warning(dlg, "Not Found", "Could not find matching transaction.")
@@ -245,6 +258,10 @@ class MainWindow(QMainWindow):
 
         dlg.exec()
 
+    def closeEvent(self, event):
+        self.workers.cancel_all()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,236 @@
+# Streaming statement import: parse -> normalize -> dedupe -> categorize -> commit
+#
+# Every stage is a generator, so a statement is never held in memory as a whole;
+# only one categorization batch is buffered at a time.
+import csv
+import os
+import re
+from collections import Counter
+from datetime import date, datetime
+
+from dates import DateParser
+from gpt_advisor import categorize_transactions
+from money import parse_cents, to_amount
+
+BATCH_SIZE = 200
+SUPPORTED = (".csv", ".xlsx", ".pdf")
+
+AMOUNT_REGEX = re.compile(r"^-?\$?\d[\d,]*\.\d{2}$")
+DATE_REGEX = re.compile(r"^\d{2}/\d{2}/(\d{2}|\d{4})$")
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+# ─── PARSERS ───────────────────────────────────────────────────────────────────
+
+def _pick(row, name):
+    # Statement headers vary in case and spacing ("Amount", " amount ")
+    for key, value in row.items():
+        if key and key.strip().lower() == name:
+            return value
+    return None
+
+
+def parse_csv(path):
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield {
+                "description": _pick(row, "description"),
+                "amount": _pick(row, "amount"),
+                "date": _pick(row, "date"),
+            }
+
+
+def parse_xlsx(path):
+    from openpyxl import load_workbook  # Only needed for Excel statements
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h).strip().lower() if h is not None else "" for h in next(rows, ())]
+        for values in rows:
+            row = dict(zip(header, values))
+            yield {
+                "description": row.get("description"),
+                "amount": row.get("amount"),
+                "date": row.get("date"),
+            }
+    finally:
+        wb.close()
+
+
+def parse_pdf(path):
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(path)
+    try:
+        temp_date = None
+        temp_description_lines = []
+        # Pages are scanned one at a time; a transaction may straddle a page break
+        for page in doc:
+            for line in page.get_text().splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+
+                if DATE_REGEX.match(line):
+                    temp_date = line
+                    temp_description_lines = []
+
+                elif AMOUNT_REGEX.match(line):
+                    if temp_date and temp_description_lines:
+                        yield {
+                            "description": " ".join(temp_description_lines),
+                            "amount": line,
+                            "date": temp_date,
+                        }
+                    temp_date = None
+                    temp_description_lines = []
+
+                else:
+                    temp_description_lines.append(line)
+    finally:
+        doc.close()
+
+
+PARSERS = {".csv": parse_csv, ".xlsx": parse_xlsx, ".pdf": parse_pdf}
+
+
+def parse_statement(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in PARSERS:
+        raise ValueError(f"Unsupported statement type: {ext or path}")
+    return PARSERS[ext](path)
+
+
+# ─── PIPELINE STAGES ───────────────────────────────────────────────────────────
+
+def normalize(rows, stats):
+    for row in rows:
+        desc, amt, when = row.get("description"), row.get("amount"), row.get("date")
+        if desc is None or amt is None or str(desc).strip() == "" or str(amt).strip() == "":
+            stats["skipped"] += 1
+            continue
+        try:
+            amount = to_amount(parse_cents(str(amt).replace("$", "").replace(",", "")))
+        except ValueError:
+            stats["skipped"] += 1
+            continue
+        if amount == 0:
+            stats["skipped"] += 1
+            continue
+        if isinstance(when, (datetime, date)):
+            when = when.strftime("%Y-%m-%d")
+        yield {
+            "description": " ".join(str(desc).split()),
+            "amount": amount,
+            "date": str(when).strip() if when else None,
+            "classification": "income" if amount > 0 else "expense",
+        }
+
+
+def parse_dates(rows, stats, batch_size=BATCH_SIZE):
+    # The statement's date format is detected from its first batch; rows whose
+    # date can't be read are skipped rather than imported as today
+    parser = DateParser()
+    for batch in _batches(rows, batch_size):
+        for row, when in zip(batch, parser.parse_many(row["date"] for row in batch)):
+            if row["date"] and not when:
+                stats["skipped"] += 1
+                continue
+            row["date"] = when
+            yield row
+
+
+def ledger_keys(tracker):
+    keys = Counter()
+    for i in tracker.income:
+        keys[(i["date"], i.get("source"), i["amount"])] += 1
+    for e in tracker.expenses:
+        keys[(e["date"], e.get("category"), e["amount"])] += 1
+    return keys
+
+
+def dedupe(rows, existing, stats):
+    # A row is a duplicate only while the ledger still has an unmatched copy of it,
+    # so re-importing a statement is a no-op but two identical coffees both land.
+    existing = Counter(existing)
+    for row in rows:
+        key = (row["date"], row["description"], row["amount"])
+        if row["date"] and existing[key] > 0:
+            existing[key] -= 1
+            stats["duplicates"] += 1
+            continue
+        yield row
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def categorize(rows, batch_size=BATCH_SIZE, items_per_prompt=25):
+    for batch in _batches(rows, batch_size):
+        categories = categorize_transactions([r["description"] for r in batch], items_per_prompt=items_per_prompt)
+        for row, category in zip(batch, categories):
+            row["category"] = category
+        yield batch
+
+
+def commit_batch(tracker, batch, stats):
+    for row in batch:
+        tracker.add_transaction(row["description"], row["amount"], row["classification"],
+                                row["date"], row["category"])
+        stats["imported"] += 1
+
+
+def prepare_statement(path, existing, stats, batch_size=BATCH_SIZE, cancel=None):
+    # Everything except the commit; touches no tracker state, so it can run on a worker thread
+    rows = normalize(parse_statement(path), stats)
+    rows = parse_dates(rows, stats, batch_size)
+    rows = dedupe(rows, existing, stats)
+    for batch in categorize(rows, batch_size):
+        if cancel and cancel():
+            raise ImportCancelled()
+        yield batch
+
+
+def new_stats():
+    return Counter(imported=0, duplicates=0, skipped=0)
+
+
+def import_statement(tracker, path, batch_size=BATCH_SIZE, save=False, progress=None, cancel=None):
+    # Returns counts of imported, duplicate and skipped rows
+    stats = new_stats()
+    for batch in prepare_statement(path, ledger_keys(tracker), stats, batch_size, cancel):
+        commit_batch(tracker, batch, stats)
+        if save:
+            tracker.save_data_quietly()
+        if progress:
+            progress(stats["imported"], batch)
+    return dict(stats)
+
+
+if __name__ == "__main__":
+    # python importer.py statement.csv [more statements...]
+    import sys
+    from tracker import BudgetTracker
+
+    if len(sys.argv) < 2:
+        print(f"Usage: python importer.py STATEMENT{{{','.join(SUPPORTED)}}} ...")
+        sys.exit(1)
+    tracker = BudgetTracker(None)
+    tracker.load_data()
+    for statement in sys.argv[1:]:
+        result = import_statement(tracker, statement, save=True,
+                                  progress=lambda n, _: print(f"\r{n} rows imported", end="", flush=True))
+        print(f"\r{statement}: {result['imported']} imported, {result['duplicates']} duplicates, "
+              f"{result['skipped']} skipped")
@@ -0,0 +1,153 @@
+# In-memory ledger container used by BudgetTracker
+#
+# Every ledger backend (this one, the NumPy store in columnar.py and the SQLite
+# view in storage.py) exposes the same small interface so the tracker never
+# needs to know where rows live:
+#   append / extend / remove / clear / iteration / len / indexing
+#   get(id) / update(id, fields) / delete(id)  -> O(1) by transaction id
+#   ensure_ids()                 -> give legacy rows an id, returns how many
+#   query(start, end, category, offset, limit)  -> list of entries (one page)
+#   total()                      -> sum of amounts
+#   monthly_averages()           -> {"YYYY-MM": average amount}
+# Sums are taken in integer cents (money.py) and converted back once.
+import uuid
+from itertools import islice
+
+from money import cents, to_amount
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def _matches(entry, start, end, category):
+    date = entry["date"]
+    if start and date < start:
+        return False
+    if end and date > end:
+        return False
+    if category and entry.get("category") != category:
+        return False
+    return True
+
+
+class ListLedger:
+    # Rows live in a list in insertion order; deleting leaves a hole (None) so
+    # no other row moves. Reads skip holes without touching the list (readers
+    # share a lock, so they must not mutate it); deletes squeeze them out once
+    # they pile up.
+    def __init__(self, rows=()):
+        self._rows = []
+        self._pos = {}   # id -> index into _rows
+        self._holes = 0
+        self.extend(rows)
+
+    # ─── LIST INTERFACE ────────────────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self._rows) - self._holes
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        if not self._holes:
+            return iter(self._rows)
+        return (row for row in self._rows if row is not None)
+
+    def __getitem__(self, index):
+        if not self._holes:
+            return self._rows[index]
+        if isinstance(index, int) and index >= 0:
+            for row in islice(self, index, None):
+                return row
+            raise IndexError("ledger index out of range")
+        return list(self)[index]
+
+    def append(self, entry):
+        txn_id = entry.get("id")
+        if txn_id is not None:
+            self._pos[txn_id] = len(self._rows)
+        self._rows.append(entry)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def remove(self, entry):
+        # Content match for rows without an id (old journal records)
+        if entry.get("id") is not None and entry["id"] in self._pos:
+            self.delete(entry["id"])
+            return
+        for i, row in enumerate(self._rows):
+            if row is not None and row == entry:
+                self._drop(i)
+                return
+        raise ValueError("entry not in ledger")
+
+    def clear(self):
+        self._rows = []
+        self._pos = {}
+        self._holes = 0
+
+    def _drop(self, i):
+        row = self._rows[i]
+        self._rows[i] = None
+        self._holes += 1
+        self._pos.pop(row.get("id"), None)
+        if self._holes > 1024 and self._holes * 2 > len(self._rows):
+            self._compact()
+        return row
+
+    def _compact(self):
+        if not self._holes:
+            return
+        self._rows = [row for row in self._rows if row is not None]
+        self._pos = {row["id"]: i for i, row in enumerate(self._rows) if row.get("id") is not None}
+        self._holes = 0
+
+    # ─── ID INDEX ──────────────────────────────────────────────────────────────
+
+    def ensure_ids(self):
+        assigned = 0
+        for i, row in enumerate(self._rows):
+            if row is not None and row.get("id") is None:
+                row["id"] = new_id()
+                self._pos[row["id"]] = i
+                assigned += 1
+        return assigned
+
+    def get(self, txn_id):
+        i = self._pos.get(txn_id)
+        return None if i is None else self._rows[i]
+
+    def update(self, txn_id, fields):
+        # Returns (old, new) copies of the entry, or None if the id is unknown
+        i = self._pos.get(txn_id)
+        if i is None:
+            return None
+        old = dict(self._rows[i])
+        self._rows[i].update(fields)
+        return old, dict(self._rows[i])
+
+    def delete(self, txn_id):
+        i = self._pos.get(txn_id)
+        return None if i is None else self._drop(i)
+
+    # ─── ANALYTICS ─────────────────────────────────────────────────────────────
+
+    def query(self, start=None, end=None, category=None, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        if not (start or end or category):
+            return self._rows[offset:stop] if not self._holes else list(islice(self, offset, stop))
+        return list(islice((e for e in self if _matches(e, start, end, category)), offset, stop))
+
+    def total(self):
+        return to_amount(sum(cents(item["amount"]) for item in self))
+
+    def monthly_averages(self):
+        result = {}
+        for entry in self:
+            month = entry["date"][:7]  # YYYY-MM
+            result.setdefault(month, []).append(cents(entry["amount"]))
+        return {month: to_amount(sum(v) / len(v)) for month, v in result.items()}
@@ -0,0 +1,149 @@
+# Load test for the API against a shared SQLite ledger
+#
+#   python loadtest.py                 # 1, 2 and 4 workers, 10 s each
+#   python loadtest.py -w 1 8 -d 20 -c 32 --writes 0.2
+#
+# Workers are gunicorn processes when gunicorn is installed. Otherwise each
+# worker is a separate threaded Flask server on its own port and the client
+# spreads requests across them like a load balancer would. Every run starts from
+# an empty database in a temp directory and ends with a consistency check: the
+# balance each worker reports must account for every write made through any of them.
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def start_servers(workers, workdir):
+    env = dict(os.environ, PENNYPILOT_STORAGE="sqlite", PENNYPILOT_DATA_FILE=os.path.join(workdir, "loadtest.db"),
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Create the schema once so workers don't race to build it
+    subprocess.run([sys.executable, "-c", "from storage import SQLiteStorage; "
+                    f"SQLiteStorage({env['PENNYPILOT_DATA_FILE']!r}, legacy_json=None)._connect()"],
+                   cwd=workdir, env=env, check=True)
+    log = open(os.path.join(workdir, "server.log"), "w")
+    if shutil.which("gunicorn"):
+        port = _free_port()
+        procs = [subprocess.Popen(["gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "api:app"],
+                                  cwd=workdir, env=env, stdout=log, stderr=log)]
+        ports = [port]
+    else:
+        ports = [_free_port() for _ in range(workers)]
+        code = "import sys; from api import app; app.run(port=int(sys.argv[1]), threaded=True)"
+        procs = [subprocess.Popen([sys.executable, "-c", code, str(p)], cwd=workdir, env=env, stdout=log, stderr=log)
+                 for p in ports]
+    for port in ports:
+        _wait_for(port)
+    return procs, ports
+
+
+def stop_servers(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+
+class Client:
+    # One keep-alive connection per client thread
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path}: {response.status} {data[:200]!r}")
+        return json.loads(data)
+
+
+def run(workers, duration, concurrency, write_ratio):
+    workdir = tempfile.mkdtemp(prefix="pennypilot-load-")
+    procs, ports = start_servers(workers, workdir)
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(n):
+        c = Client(ports[n % len(ports)])
+        reads = writes = errors = 0
+        while time.time() < deadline:
+            try:
+                if random.random() < write_ratio:
+                    c.request("POST", "/add_expense", {"amount": -1, "category": "load test", "date": "2024-01-01"})
+                    writes += 1
+                else:
+                    c.request("GET", "/view_balance")
+                    reads += 1
+            except Exception:
+                errors += 1
+                c = Client(ports[n % len(ports)])
+        with lock:
+            counts["reads"] += reads
+            counts["writes"] += writes
+            counts["errors"] += errors
+
+    try:
+        start = time.time()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(client, range(concurrency)))
+        elapsed = time.time() - start
+        # Every write is a -1 expense, so the balance is minus the number of writes
+        balances = {Client(port).request("GET", "/view_balance")["balance"] for port in ports for _ in range(workers)}
+        consistent = balances == {-float(counts["writes"])}
+    finally:
+        stop_servers(procs)
+        shutil.rmtree(workdir, ignore_errors=True)
+    total = counts["reads"] + counts["writes"]
+    return total / elapsed, counts, consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API throughput against worker count.")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="client threads")
+    parser.add_argument("--writes", type=float, default=0.1, help="fraction of requests that write")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7}  {'req/s':>8}  {'reads':>7}  {'writes':>7}  {'errors':>6}  consistent")
+    baseline = None
+    for workers in args.workers:
+        rate, counts, consistent = run(workers, args.duration, args.concurrency, args.writes)
+        baseline = baseline or rate
+        print(f"{workers:>7}  {rate:>8.0f}  {counts['reads']:>7}  {counts['writes']:>7}  {counts['errors']:>6}  "
+              f"{'yes' if consistent else 'NO'}  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
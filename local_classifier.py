@@ -0,0 +1,134 @@
+# Offline transaction categorizer used before falling back to GPT
+#
+# Two layers: a keyword rule table for merchants everyone has, then a
+# multinomial naive Bayes model trained on the user's own categorized ledger.
+# Both run in well under a millisecond, so most rows never touch the network.
+import math
+import os
+import re
+import threading
+
+from cache import normalize_merchant
+from storage import open_storage
+
+CONFIDENCE_THRESHOLD = float(os.getenv("PENNYPILOT_LOCAL_THRESHOLD", "0.9"))
+MIN_EXAMPLES = 20
+
+RULES = [
+    (r"\b(payroll|salary|direct dep(osit)?|paycheck)\b", "salary"),
+    (r"\b(uber eats|doordash|grubhub|postmates|starbucks|dunkin|mcdonald'?s|chipotle|subway|"
+     r"restaurant|cafe|coffee|pizza|burger|taco|diner|bakery)\b", "food"),
+    (r"\b(kroger|safeway|whole foods|trader joe'?s|aldi|publix|wegmans|heb|grocery|groceries|"
+     r"supermarket|food lion|sprouts)\b", "groceries"),
+    (r"\b(shell|chevron|exxon|exxonmobil|mobil|bp|sunoco|valero|citgo|marathon|speedway|fuel|gas station)\b", "gas"),
+    (r"\b(electric|water|sewer|utility|utilities|comcast|xfinity|verizon|at&t|t mobile|"
+     r"spectrum|internet|pg&e|duke energy)\b", "utilities"),
+    (r"\b(netflix|spotify|hulu|disney|hbo|youtube|steam|playstation|xbox|nintendo|cinema|"
+     r"theater|theatre|amc|ticketmaster)\b", "entertainment"),
+    (r"\b(airlines?|airways|delta|united|southwest|jetblue|hotel|airbnb|marriott|hilton|"
+     r"expedia|booking com|uber|lyft|amtrak)\b", "travel"),
+    (r"\b(amazon|amzn|target|walmart|best buy|ebay|etsy|ikea|home depot|lowe'?s|costco)\b", "shopping"),
+    (r"\b(fee|fees|overdraft|interest charge|service charge|late charge)\b", "fees"),
+    (r"\b(pharmacy|cvs|walgreens|rite aid|hospital|clinic|dental|dentist|doctor|medical|optometr\w*)\b", "health"),
+    (r"\b(transfer|zelle|venmo|cash app)\b", "transfer"),
+    (r"\b(tuition|university|college|school|coursera|udemy)\b", "education"),
+    (r"\b(gift|donation|charity)\b", "gifts"),
+]
+_RULES = [(re.compile(pattern), category) for pattern, category in RULES]
+
+
+class LocalClassifier:
+    def __init__(self, threshold=CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._class_counts = {}    # category -> number of examples
+        self._token_counts = {}    # category -> {token: count}
+        self._token_totals = {}    # category -> total tokens
+        self._vocab = set()
+        self._examples = 0
+
+    @staticmethod
+    def _tokens(description):
+        text = normalize_merchant(description)
+        words = text.split()
+        # Word bigrams help with multi-word merchants ("whole foods" vs "foods")
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    # ─── TRAINING ──────────────────────────────────────────────────────────────
+
+    def learn(self, description, category):
+        tokens = self._tokens(description)
+        if not tokens or not category:
+            return
+        with self._lock:
+            self._examples += 1
+            self._class_counts[category] = self._class_counts.get(category, 0) + 1
+            counts = self._token_counts.setdefault(category, {})
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+                self._vocab.add(token)
+            self._token_totals[category] = self._token_totals.get(category, 0) + len(tokens)
+
+    def train(self, examples):
+        for description, category in examples:
+            self.learn(description, category)
+        return self
+
+    def train_from_ledger(self, income, expenses, valid_categories):
+        # Income rows keep the GPT category in "category"; expense rows in "expense_category"
+        examples = [(i.get("source"), i.get("category")) for i in income]
+        examples += [(e.get("category"), e.get("expense_category")) for e in expenses]
+        return self.train((d, c) for d, c in examples if d and c in valid_categories)
+
+    # ─── PREDICTION ────────────────────────────────────────────────────────────
+
+    def predict(self, description):
+        # Returns (category, confidence); confidence is 1.0 for rule hits
+        text = normalize_merchant(description)
+        for pattern, category in _RULES:
+            if pattern.search(text):
+                return category, 1.0
+        with self._lock:
+            return self._predict_model(self._tokens(description))
+
+    def _predict_model(self, tokens):
+        if self._examples < MIN_EXAMPLES or len(self._class_counts) < 2 or not tokens:
+            return None, 0.0
+        known = [t for t in tokens if t in self._vocab]
+        if not known:
+            return None, 0.0
+        vocab_size = len(self._vocab)
+        scores = {}
+        for category, n in self._class_counts.items():
+            counts, total = self._token_counts[category], self._token_totals[category]
+            score = math.log(n / self._examples)
+            for token in known:
+                score += math.log((counts.get(token, 0) + 1) / (total + vocab_size))
+            scores[category] = score
+        best = max(scores, key=scores.get)
+        # Softmax over log-scores gives the posterior for the winning class
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+    def classify(self, description):
+        # Category if confident enough to skip GPT, otherwise None
+        category, confidence = self.predict(description)
+        return category if confidence >= self.threshold else None
+
+
+_classifier = None
+
+
+def get_local_classifier(valid_categories):
+    global _classifier
+    if _classifier is None:
+        classifier = LocalClassifier()
+        try:
+            income, expenses = open_storage().read()
+            classifier.train_from_ledger(income, expenses, valid_categories)
+        except FileNotFoundError:
+            pass  # No ledger yet; rules still apply
+        except Exception as e:
+            print(f"Could not train local classifier: {e}")
+        _classifier = classifier
+    return _classifier
@@ -0,0 +1,121 @@
+# OpenAI-compatible mock server for exercising gpt_advisor offline
+#
+#   python mock_openai.py --port 8765 --latency 0.2 --fail 0.1 --rate-limit 0.1
+#   OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python importer.py statement.csv
+#
+# Serves /v1/chat/completions, streaming and not, over keep-alive HTTP/1.1.
+# --fail answers a fraction of requests with 500, --rate-limit with 429 (and a
+# Retry-After header), --latency delays every answer so client timeouts can be
+# tried. GET /stats reports requests served and connections opened, which shows
+# whether the client is reusing its pool.
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+stats = {"requests": 0, "connections": 0, "errors": 0, "rate_limited": 0}
+_lock = threading.Lock()
+
+
+def _count(key):
+    with _lock:
+        stats[key] += 1
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # Clients hanging up after a timeout are expected here
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    answer = "Mock advice."
+
+    def setup(self):
+        super().setup()
+        _count("connections")
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path != "/stats":
+            return self._send(404, {"error": {"message": "not found"}})
+        with _lock:
+            self._send(200, dict(stats))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        _count("requests")
+        opts = self.options
+        if opts.latency:
+            time.sleep(opts.latency)
+        roll = random.random()
+        if roll < opts.rate_limit:
+            _count("rate_limited")
+            return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                              [("Retry-After", "0.1")])
+        if roll < opts.rate_limit + opts.fail:
+            _count("errors")
+            return self._send(500, {"error": {"message": "Mock server error", "type": "server_error"}})
+
+        if not body.get("stream"):
+            return self._send(200, {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.answer}}]})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in self.answer.split(" "):
+            chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model"),
+                     "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def serve(port=8765, latency=0.0, fail=0.0, rate_limit=0.0, answer=None):
+    Handler.options = argparse.Namespace(latency=latency, fail=fail, rate_limit=rate_limit)
+    if answer:
+        Handler.answer = answer
+    return _Server(("127.0.0.1", port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat completions API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--fail", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--answer", help="text every completion returns")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency, args.fail, args.rate_limit, args.answer)
+    print(f"Mock OpenAI API on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
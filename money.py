@@ -0,0 +1,36 @@
+# Money as integer cents
+#
+# Entries keep `amount` as a float, so the API, GUI and JSON files are unchanged,
+# but the float is always a whole number of cents: input is rounded once, half
+# up, when it enters the ledger. Everything that adds amounts up (running totals,
+# the columnar store, SQLite) works in integer cents, which stay exact however
+# many rows there are, and converts back to dollars only when a total is read.
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+_CENT = Decimal("0.01")
+
+
+def parse_cents(value):
+    # User or file input -> cents. Goes through the decimal text, so "1.005" is
+    # 101 cents rather than whatever 1.005 * 100 happens to be as a float.
+    try:
+        amount = Decimal(str(value).strip()).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):  # Also NaN and infinity
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(amount * 100)
+
+
+def cents(amount):
+    # A stored amount (already a whole number of cents) -> cents; fast path for sums
+    return round(amount * 100)
+
+
+def to_amount(cents):
+    return cents / 100
+
+
+def quantize(amount):
+    # Rounds an amount to whole cents, e.g. 0.30000000000000004 -> 0.3. Amounts
+    # that already are whole cents (nearly all of them) skip the Decimal round trip.
+    whole = to_amount(cents(amount))
+    return whole if whole == amount else to_amount(parse_cents(amount))
@@ -0,0 +1,81 @@
+# Prompt construction helpers: token counting, completion budgets and fitting
+# ledger breakdowns into a fixed number of prompt tokens
+#
+# Counts come from tiktoken when it is installed and its encoding can be loaded
+# (the first load downloads it). Otherwise an estimate that errs slightly high is
+# used, so a budget that fits by the estimate fits for the model too.
+import math
+import re
+import textwrap
+from functools import lru_cache
+
+MODEL = "gpt-3.5-turbo"
+CONTEXT_WINDOWS = {"gpt-3.5-turbo": 16385}
+DEFAULT_CONTEXT_WINDOW = 4096
+MESSAGE_OVERHEAD = 4  # Role and separator tokens per chat message
+REPLY_OVERHEAD = 3    # Tokens priming the assistant's reply
+
+_PIECES = re.compile(r"[A-Za-z]+|\d+|\S")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # Not installed, or the encoding can't be fetched (offline)
+        return None
+
+
+def _estimate(text):
+    # Words run about four letters per token, digits three; every other symbol is one
+    tokens = sum(math.ceil(len(piece) / (3 if piece[0].isdigit() else 4)) for piece in _PIECES.findall(text))
+    return math.ceil(tokens * 1.1)
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text, model=MODEL):
+    encoding = _encoding(model)
+    return len(encoding.encode(text)) if encoding is not None else _estimate(text)
+
+
+def count_message_tokens(messages, model=MODEL):
+    return sum(MESSAGE_OVERHEAD + count_tokens(m["content"], model) for m in messages) + REPLY_OVERHEAD
+
+
+def clean(text):
+    # Template indentation and padding cost tokens and tell the model nothing
+    return textwrap.dedent(text).strip()
+
+
+def completion_budget(messages, wanted, model=MODEL):
+    # max_tokens for a request: what the task needs, capped by what's left of the context
+    room = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW) - count_message_tokens(messages, model)
+    return max(1, min(wanted, room))
+
+
+def fit_rows(rows, render, summarize, budget, model=MODEL):
+    # rows come in priority order. As many as fit in `budget` tokens are rendered
+    # with render(row); the rest collapse into a single summarize(rest) line.
+    lines, used = [], 0
+    for row in rows:
+        line = render(row)
+        cost = count_tokens(line, model) + 1  # + newline
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    else:
+        return lines
+    # Drop the lowest-priority kept rows until the summary line fits too
+    while True:
+        summary = summarize(rows[len(lines):])
+        cost = count_tokens(summary, model) + 1
+        if used + cost <= budget:
+            return lines + [summary]
+        if not lines:
+            return []
+        used -= count_tokens(lines.pop(), model) + 1
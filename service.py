@@ -0,0 +1,111 @@
+# Concurrency-safe access to a BudgetTracker for the API
+#
+# Request handlers take service.read() or service.write() around every tracker
+# call: any number of readers run together, writers run alone. With a shared
+# backend (SQLite) several processes can serve the same ledger; each write is
+# committed as it happens, and before every request the service checks whether
+# another process has committed since and, if so, refreshes the running totals.
+#
+# With loaded=False the ledger is read by the first request instead of up front,
+# so a new worker accepts connections as soon as its modules are imported.
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    # Writer-preferring: once a writer is waiting, new readers queue behind it
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class TrackerService:
+    def __init__(self, tracker, autosave=None, loaded=True):
+        self.tracker = tracker
+        self.loaded = loaded
+        self.lock = RWLock()
+        # Shared backends must commit every write, or other processes never see it
+        self.autosave = getattr(tracker.storage, "shared", False) if autosave is None else autosave
+        self._version = self._data_version()
+
+    def _data_version(self):
+        storage = self.tracker.storage
+        return storage.data_version() if hasattr(storage, "data_version") else None
+
+    def _load(self):
+        # Called with the write lock held
+        if not self.loaded:
+            self.tracker.load_data()
+            self._version = self._data_version()
+            self.loaded = True
+
+    def load(self):
+        with self.lock.write():
+            self._load()
+
+    def _sync(self):
+        # Called with the write lock held
+        self._load()
+        version = self._data_version()
+        if version != self._version:
+            self.tracker.totals.rebuild(self.tracker.income, self.tracker.expenses)
+            self._version = version
+
+    @contextmanager
+    def read(self):
+        # The version check uses the shared connection, so it must not overlap a write
+        with self.lock.read():
+            stale = not self.loaded or self._data_version() != self._version
+        if stale:
+            with self.lock.write():
+                self._sync()
+        with self.lock.read():
+            yield self.tracker
+
+    @contextmanager
+    def write(self):
+        storage = self.tracker.storage
+        with self.lock.write():
+            self._sync()
+            if self.autosave and hasattr(storage, "begin"):
+                storage.begin()
+            try:
+                yield self.tracker
+            except Exception:
+                if self.autosave and hasattr(storage, "rollback"):
+                    storage.rollback()
+                    self._version = None  # Totals may include the rolled-back write
+                raise
+            if self.autosave:
+                self.tracker.save_data_quietly()
@@ -0,0 +1,805 @@
+# Storage backends for BudgetTracker
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from itertools import islice
+
+from ledger import ListLedger, new_id
+from money import cents, quantize
+
+DEFAULT_DATA_FILE = "budget_data.json"
+
+
+def _write_snapshot(path, income, expenses):
+    # Write to a temp file first so a crash never leaves a half-written ledger
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"income": list(income), "expenses": list(expenses)}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_snapshot(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    income, expenses = data.get("income", []), data.get("expenses", [])
+    for entry in (*income, *expenses):
+        _quantize(entry)
+    return income, expenses
+
+
+def _quantize(entry):
+    # Files written before amounts were kept in whole cents may carry float noise
+    # (0.30000000000000004); it is rounded away on load and gone after the next save
+    if entry and "amount" in entry:
+        entry["amount"] = quantize(entry["amount"])
+    return entry
+
+
+# ─── JSON (FULL REWRITE) ───────────────────────────────────────────────────────
+
+class JsonStorage:
+    def __init__(self, path=DEFAULT_DATA_FILE):
+        self.path = path
+
+    def load(self, path=None):
+        return _read_snapshot(path or self.path)
+
+    def read(self, path=None):
+        return self.load(path)
+
+    def record(self, op, kind, entry=None):
+        pass  # Nothing to journal, every save rewrites the whole file
+
+    def save(self, income, expenses, path=None):
+        path = path or self.path
+        with open(path, "w") as f:
+            json.dump({"income": list(income), "expenses": list(expenses)}, f, indent=2)
+
+    def close(self):
+        pass
+
+
+# ─── JOURNAL (SNAPSHOT + APPEND-ONLY LOG) ──────────────────────────────────────
+
+class JournalStorage:
+    # The snapshot is the same file format as budget_data.json, so existing
+    # ledgers load unchanged and a compacted journal is a plain JSON export.
+    def __init__(self, path=DEFAULT_DATA_FILE, compact_every=5000):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_every = compact_every
+        self._pending = []
+        self._journal_len = 0
+
+    def load(self, path=None):
+        # Loading replaces the in-memory ledger, so unsaved mutations are dropped
+        income, expenses = self.read(path)
+        if not path or path == self.path:
+            self._pending = []
+        return income, expenses
+
+    def read(self, path=None):
+        if path and path != self.path:
+            return _read_snapshot(path)
+
+        income, expenses = [], []
+        if os.path.exists(self.path):
+            income, expenses = _read_snapshot(self.path)
+        elif not os.path.exists(self.journal_path):
+            raise FileNotFoundError(self.path)
+
+        # Replay into id-indexed ledgers so deletes and updates are O(1) each
+        income, expenses = ListLedger(income), ListLedger(expenses)
+        self._journal_len = 0
+        for rec in self._read_journal():
+            self._apply(rec, income, expenses)
+            self._journal_len += 1
+        return list(income), list(expenses)
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Torn tail from a crash mid-write; everything before it is good
+
+    @staticmethod
+    def _apply(rec, income, expenses):
+        ledgers = {"income": income, "expenses": expenses}
+        op, kind = rec.get("op"), rec.get("kind")
+        if op == "add":
+            ledgers[kind].append(_quantize(rec["entry"]))
+        elif op == "delete":
+            try:
+                ledgers[kind].remove(_quantize(rec["entry"]))
+            except ValueError:
+                pass
+        elif op == "update":
+            ledgers[kind].update(rec["entry"]["id"], _quantize(rec["entry"]))
+        elif op == "clear":
+            for k in ([kind] if kind else ledgers):
+                ledgers[k].clear()
+
+    def record(self, op, kind, entry=None):
+        self._pending.append({"op": op, "kind": kind, "entry": entry})
+
+    def save(self, income, expenses, path=None):
+        if path and path != self.path:
+            _write_snapshot(path, income, expenses)
+            return
+
+        if self._journal_len + len(self._pending) >= self.compact_every or not os.path.exists(self.path):
+            self.compact(income, expenses)
+            return
+
+        if self._pending:
+            # One append and one fsync for the whole batch of mutations
+            with open(self.journal_path, "a") as f:
+                f.write("".join(json.dumps(rec) + "\n" for rec in self._pending))
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_len += len(self._pending)
+            self._pending = []
+
+    def compact(self, income, expenses):
+        _write_snapshot(self.path, income, expenses)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._pending = []
+        self._journal_len = 0
+
+    def backup(self, backup_path):
+        # The last saved state (snapshot plus journal) as one plain snapshot;
+        # renaming the snapshot alone would leave the journaled changes out of it
+        try:
+            income, expenses = self.read()
+        except FileNotFoundError:
+            return  # Nothing saved yet
+        _write_snapshot(backup_path, income, expenses)
+
+    def close(self):
+        pass
+
+
+# ─── SQLITE ────────────────────────────────────────────────────────────────────
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    amount REAL NOT NULL,
+    date TEXT NOT NULL,
+    source TEXT,
+    category TEXT,
+    extra TEXT,
+    uid TEXT,
+    cents INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_kind_date ON transactions(kind, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_kind_category ON transactions(kind, category, date);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+INSERT OR IGNORE INTO meta VALUES ('epoch', lower(hex(randomblob(4))));
+"""
+
+# The transaction id lives in "uid"; "id" is SQLite's rowid and only orders rows.
+# Amounts are read from and summed over "cents" (exact integers); "amount" holds
+# the same value in dollars for anything reading the table directly.
+COLUMNS = ("cents", "date", "source", "category", "extra", "uid")
+
+
+def _row_to_entry(row):
+    entry = {"id": row[5], "amount": row[0] / 100, "date": row[1]}
+    if row[2] is not None:
+        entry["source"] = row[2]
+    entry["category"] = row[3]
+    if row[4]:
+        entry.update(json.loads(row[4]))
+    return entry
+
+
+def _extra(entry):
+    # Anything beyond the fixed columns (e.g. expense_category) rides along as JSON
+    extra = {k: v for k, v in entry.items() if k not in COLUMNS and k not in ("id", "amount")}
+    return json.dumps(extra, sort_keys=True) if extra else None
+
+
+class SQLiteLedger:
+    # List-like view over one kind of row; nothing is held in memory
+    def __init__(self, storage, kind):
+        self.storage = storage
+        self.kind = kind
+
+    @property
+    def conn(self):
+        return self.storage._connect()
+
+    def _select(self, where="", params=(), tail=""):
+        sql = f"SELECT {', '.join(COLUMNS)} FROM transactions WHERE kind = ? {where} ORDER BY id {tail}"
+        return self.conn.execute(sql, (self.kind, *params))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM transactions WHERE kind = ?", (self.kind,)).fetchone()[0]
+
+    def __bool__(self):
+        return self.conn.execute("SELECT 1 FROM transactions WHERE kind = ? LIMIT 1", (self.kind,)).fetchone() is not None
+
+    def __iter__(self):
+        return (_row_to_entry(row) for row in self._select())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            rows = self._select(tail="LIMIT ? OFFSET ?", params=(max(0, stop - start), start))
+            return [_row_to_entry(row) for row in rows]
+        if index < 0:
+            index += len(self)
+        row = self._select(tail="LIMIT 1 OFFSET ?", params=(index,)).fetchone()
+        if row is None:
+            raise IndexError("ledger index out of range")
+        return _row_to_entry(row)
+
+    def append(self, entry):
+        self.extend([entry])
+
+    def extend(self, entries):
+        self.conn.executemany(
+            "INSERT INTO transactions (kind, amount, cents, date, source, category, extra, uid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((self.kind, e["amount"], cents(e["amount"]), e["date"], e.get("source"), e.get("category"), _extra(e),
+              e.get("id") or new_id())
+             for e in entries))
+
+    def remove(self, entry):
+        if entry.get("id") is not None:
+            if self.delete(entry["id"]) is None:
+                raise ValueError("entry not in ledger")
+            return
+        row = self.conn.execute(
+            "SELECT id FROM transactions WHERE kind = ? AND cents = ? AND date = ? "
+            "AND source IS ? AND category IS ? AND extra IS ? ORDER BY id LIMIT 1",
+            (self.kind, cents(entry["amount"]), entry["date"], entry.get("source"), entry.get("category"),
+             _extra(entry))).fetchone()
+        if row is None:
+            raise ValueError("entry not in ledger")
+        self.conn.execute("DELETE FROM transactions WHERE id = ?", (row[0],))
+
+    def clear(self):
+        self.conn.execute("DELETE FROM transactions WHERE kind = ?", (self.kind,))
+
+    # ─── ID INDEX ──────────────────────────────────────────────────────────────
+
+    def ensure_ids(self):
+        return 0  # Backfilled when the database is opened
+
+    def get(self, txn_id):
+        row = self._select("AND uid = ?", (txn_id,)).fetchone()
+        return None if row is None else _row_to_entry(row)
+
+    def update(self, txn_id, fields):
+        old = self.get(txn_id)
+        if old is None:
+            return None
+        new = {**old, **fields, "id": txn_id}
+        self.conn.execute(
+            "UPDATE transactions SET amount = ?, cents = ?, date = ?, source = ?, category = ?, extra = ? "
+            "WHERE kind = ? AND uid = ?",
+            (new["amount"], cents(new["amount"]), new["date"], new.get("source"), new.get("category"), _extra(new), self.kind, txn_id))
+        return old, new
+
+    def delete(self, txn_id):
+        entry = self.get(txn_id)
+        if entry is not None:
+            self.conn.execute("DELETE FROM transactions WHERE kind = ? AND uid = ?", (self.kind, txn_id))
+        return entry
+
+    def query(self, start=None, end=None, category=None, offset=0, limit=None):
+        where, params = [], []
+        if category:
+            where.append("AND category = ?"); params.append(category)
+        if start:
+            where.append("AND date >= ?"); params.append(start)
+        if end:
+            where.append("AND date <= ?"); params.append(end)
+        params += [-1 if limit is None else limit, offset]
+        return [_row_to_entry(row) for row in self._select(" ".join(where), params, tail="LIMIT ? OFFSET ?")]
+
+    def total(self):
+        row = self.conn.execute("SELECT COALESCE(SUM(cents), 0) FROM transactions WHERE kind = ?", (self.kind,)).fetchone()
+        return row[0] / 100
+
+    def monthly_averages(self):
+        rows = self.conn.execute(
+            "SELECT substr(date, 1, 7) AS month, AVG(cents) / 100 FROM transactions "
+            "WHERE kind = ? GROUP BY month", (self.kind,))
+        return dict(rows.fetchall())
+
+    def summary(self):
+        # Everything RunningTotals needs (sums in cents), as GROUP BYs instead of a Python pass over every row
+        total, count = self.conn.execute(
+            "SELECT COALESCE(SUM(cents), 0), COUNT(*) FROM transactions WHERE kind = ?", (self.kind,)).fetchone()
+        months = self.conn.execute(
+            "SELECT substr(date, 1, 7) AS month, SUM(cents), COUNT(*) FROM transactions "
+            "WHERE kind = ? GROUP BY month", (self.kind,)).fetchall()
+        categories = self.conn.execute(
+            "SELECT category, SUM(cents) FROM transactions WHERE kind = ? GROUP BY category", (self.kind,)).fetchall()
+        cells = {}
+        for month, category, cell in self.conn.execute(
+                "SELECT substr(date, 1, 7) AS month, category, SUM(cents) FROM transactions "
+                "WHERE kind = ? GROUP BY month, category", (self.kind,)):
+            cells.setdefault(month, {})[category] = cell
+        return {
+            "total": total,
+            "count": count,
+            "month_sums": {m: s for m, s, _ in months},
+            "month_counts": {m: c for m, _, c in months},
+            "category_sums": dict(categories),
+            "month_category_sums": cells,
+        }
+
+
+class SQLiteStorage:
+    shared = True  # Several processes can open the same database (see service.py)
+
+    def __init__(self, path="budget_data.db", legacy_json=DEFAULT_DATA_FILE):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.conn = None
+        self._pid = None
+
+    def _connect(self):
+        if self.conn is not None and self._pid != os.getpid():
+            self.conn = None  # Forked WSGI worker; a connection must not cross processes
+        if self.conn is None:
+            fresh = not os.path.exists(self.path)
+            # Flask serves requests from worker threads; callers serialize access
+            self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._pid = os.getpid()
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")}
+            if "extra" not in columns:  # Databases created before extra fields were kept
+                self.conn.execute("ALTER TABLE transactions ADD COLUMN extra TEXT")
+            if "uid" not in columns:  # Databases created before transactions had ids
+                self.conn.execute("ALTER TABLE transactions ADD COLUMN uid TEXT")
+            if "cents" not in columns:  # Databases created before amounts were summed in cents
+                with self.conn:
+                    self.conn.execute("ALTER TABLE transactions ADD COLUMN cents INTEGER")
+                    self.conn.execute("UPDATE transactions SET cents = CAST(round(amount * 100) AS INTEGER), "
+                                      "amount = round(amount, 2)")
+            with self.conn:
+                self.conn.execute("UPDATE transactions SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_uid ON transactions(uid)")
+            if fresh and self.legacy_json and os.path.exists(self.legacy_json):
+                self.migrate_from_json(self.legacy_json)
+        return self.conn
+
+    def migrate_from_json(self, json_path):
+        # One-shot import of an existing budget_data.json into the database
+        income, expenses = _read_snapshot(json_path)
+        conn = self._connect()
+        with conn:
+            SQLiteLedger(self, "income").extend(income)
+            SQLiteLedger(self, "expenses").extend(expenses)
+        return len(income), len(expenses)
+
+    def load(self, path=None):
+        if path and path != self.path:
+            return _read_snapshot(path)
+        conn = self._connect()
+        conn.rollback()  # Loading discards anything not yet saved
+        return SQLiteLedger(self, "income"), SQLiteLedger(self, "expenses")
+
+    def read(self, path=None):
+        if path and path != self.path:
+            return _read_snapshot(path)
+        return SQLiteLedger(self, "income"), SQLiteLedger(self, "expenses")
+
+    def record(self, op, kind, entry=None):
+        pass  # Mutations are applied to the database directly
+
+    def save(self, income, expenses, path=None):
+        if path and path != self.path:
+            _write_snapshot(path, income, expenses)
+            return
+        conn = self._connect()
+        if not isinstance(income, SQLiteLedger):
+            # Tracker was populated before switching to SQLite; replace the table contents
+            with conn:
+                conn.execute("DELETE FROM transactions")
+                SQLiteLedger(self, "income").extend(income)
+                SQLiteLedger(self, "expenses").extend(expenses)
+                self._bump_version(conn)
+            return
+        if conn.in_transaction:
+            self._bump_version(conn)
+        conn.commit()
+
+    def begin(self):
+        # Take the write lock up front: a deferred transaction that upgrades after
+        # another process committed fails with "database is locked" without waiting
+        conn = self._connect()
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+
+    def version(self):
+        # Ledger version shared by every process using this database; bumped by each save
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def epoch(self):
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    def rollback(self):
+        self._connect().rollback()
+
+    def data_version(self):
+        # Changes whenever another connection (e.g. another API worker) commits
+        return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def backup(self, backup_path):
+        dest = sqlite3.connect(backup_path)
+        try:
+            self._connect().backup(dest)
+        finally:
+            dest.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ─── PARTITIONED (ONE FILE PER MONTH) ──────────────────────────────────────────
+
+# Layout of a partitioned ledger directory:
+#   manifest.json           {"income": {"2024-01": {"count", "total", "categories"}}, "expenses": {...}}
+#   income/2024-01.json     that month's rows, a JSON list
+#   expenses/2024-01.json
+# Totals in the manifest are cents. Opening the ledger reads only the manifest
+# and the newest few months; running totals come from the manifest, and older
+# months are read the first time something touches them (a range query, an id
+# lookup, full iteration). Segments are written before the manifest, each by
+# atomic replace, and only months changed since the last save are rewritten.
+EAGER_MONTHS = int(os.getenv("PENNYPILOT_EAGER_MONTHS", "3"))
+
+
+def _month_stats(rows):
+    stats = {"count": 0, "total": 0, "categories": {}}
+    for entry in rows:
+        amount = cents(entry["amount"])
+        category = entry.get("category")
+        stats["count"] += 1
+        stats["total"] += amount
+        stats["categories"][category] = stats["categories"].get(category, 0) + amount
+    return stats
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class PartitionedLedger:
+    # Ledger interface over month segments; loaded months are ListLedgers, the
+    # rest are just their manifest stats. Rows are ordered by month, then by
+    # insertion within a month.
+    lazy = True  # Views should use len()/index_of() rather than iterate every row
+
+    def __init__(self, storage, kind, eager=EAGER_MONTHS):
+        self.storage = storage
+        self.kind = kind
+        self._stats = storage.manifest.setdefault(kind, {})  # month -> stats as last saved
+        self._months = {}   # month -> ListLedger, for months read into memory
+        self._dirty = set()
+        self._load_lock = threading.Lock()
+        for month in self._all_months()[-eager:] if eager else ():
+            self._segment(month)
+
+    # ─── SEGMENTS ──────────────────────────────────────────────────────────────
+
+    def _all_months(self):
+        return sorted(set(self._stats) | set(self._months))
+
+    def _segment(self, month):
+        segment = self._months.get(month)
+        if segment is not None:
+            return segment
+        with self._load_lock:  # API readers share the read lock and may page in the same month
+            return self._load_segment(month)
+
+    def _load_segment(self, month):
+        segment = self._months.get(month)
+        if segment is None:
+            rows = []
+            path = self.storage.segment_path(self.kind, month)
+            if month in self._stats and os.path.exists(path):
+                with open(path, "r") as f:
+                    rows = [_quantize(entry) for entry in json.load(f)]
+            segment = self._months[month] = ListLedger(rows)
+            if segment.ensure_ids():
+                self._dirty.add(month)
+        return segment
+
+    def _count(self, month):
+        segment = self._months.get(month)
+        return len(segment) if segment is not None else self._stats[month]["count"]
+
+    def _find(self, txn_id):
+        # Loaded months first; older ones are read newest first until the id turns up
+        for month, segment in self._months.items():
+            if segment.get(txn_id) is not None:
+                return month
+        for month in reversed(self._all_months()):
+            if month not in self._months and self._segment(month).get(txn_id) is not None:
+                return month
+        return None
+
+    def dirty_segments(self):
+        return {month: self._months[month] for month in self._dirty}
+
+    def mark_saved(self, stats):
+        self._stats.update(stats)
+        for month, month_stats in stats.items():
+            if not month_stats["count"]:
+                del self._stats[month]
+        self._dirty.clear()
+
+    # ─── LIST INTERFACE ────────────────────────────────────────────────────────
+
+    def __len__(self):
+        return sum(self._count(month) for month in self._all_months())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for month in self._all_months():
+            yield from self._segment(month)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            rows, offset = [], 0
+            for month in self._all_months():
+                count = self._count(month)
+                if offset + count > start and offset < stop:
+                    rows += self._segment(month)[max(0, start - offset):stop - offset]
+                offset += count
+                if offset >= stop:
+                    break
+            return rows
+        rows = self[index:index + 1] if index >= 0 else self[len(self) + index:len(self) + index + 1]
+        if not rows:
+            raise IndexError("ledger index out of range")
+        return rows[0]
+
+    def index_of(self, txn_id):
+        month = self._find(txn_id)
+        if month is None:
+            return None
+        segment = self._segment(month)
+        before = sum(self._count(m) for m in self._all_months() if m < month)
+        return before + next(i for i, entry in enumerate(segment) if entry.get("id") == txn_id)
+
+    def append(self, entry):
+        month = entry["date"][:7]
+        self._segment(month).append(entry)
+        self._dirty.add(month)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def remove(self, entry):
+        if entry.get("id") is not None and self.delete(entry["id"]) is not None:
+            return
+        month = entry["date"][:7]
+        self._segment(month).remove(entry)
+        self._dirty.add(month)
+
+    def clear(self):
+        # Every month becomes an empty segment; nothing old needs reading to do that
+        for month in self._all_months():
+            self._months[month] = ListLedger()
+            self._dirty.add(month)
+
+    # ─── ID INDEX ──────────────────────────────────────────────────────────────
+
+    def ensure_ids(self):
+        return 0  # Each segment gets ids as it's read
+
+    def get(self, txn_id):
+        month = self._find(txn_id)
+        return None if month is None else self._months[month].get(txn_id)
+
+    def update(self, txn_id, fields):
+        month = self._find(txn_id)
+        if month is None:
+            return None
+        segment = self._months[month]
+        old, new = segment.update(txn_id, fields)
+        self._dirty.add(month)
+        if new["date"][:7] != month:  # Moved to another month's segment
+            self.append(segment.delete(txn_id))
+        return old, new
+
+    def delete(self, txn_id):
+        month = self._find(txn_id)
+        if month is None:
+            return None
+        self._dirty.add(month)
+        return self._months[month].delete(txn_id)
+
+    # ─── ANALYTICS ─────────────────────────────────────────────────────────────
+
+    def query(self, start=None, end=None, category=None, offset=0, limit=None):
+        if not (start or end or category):
+            return self[offset:None if limit is None else offset + limit]
+        # Only the months the date range covers are read
+        months = [m for m in self._all_months() if (not start or m >= start[:7]) and (not end or m <= end[:7])]
+        rows = (entry for m in months for entry in self._segment(m).query(start, end, category))
+        return list(islice(rows, offset, None if limit is None else offset + limit))
+
+    def summary(self):
+        # RunningTotals input (sums in cents): manifest stats for months on disk,
+        # fresh stats for months in memory
+        summary = {"total": 0, "count": 0, "month_sums": {}, "month_counts": {}, "category_sums": {},
+                   "month_category_sums": {}}
+        for month in self._all_months():
+            segment = self._months.get(month)
+            stats = _month_stats(segment) if segment is not None else self._stats[month]
+            if not stats["count"]:
+                continue
+            summary["total"] += stats["total"]
+            summary["count"] += stats["count"]
+            summary["month_sums"][month] = stats["total"]
+            summary["month_counts"][month] = stats["count"]
+            cells = summary["month_category_sums"][month] = {}
+            for category, total in stats["categories"].items():
+                category = None if category == "null" else category
+                summary["category_sums"][category] = summary["category_sums"].get(category, 0) + total
+                cells[category] = total
+        return summary
+
+    def total(self):
+        return self.summary()["total"] / 100
+
+    def monthly_averages(self):
+        summary = self.summary()
+        return {m: s / summary["month_counts"][m] / 100 for m, s in summary["month_sums"].items()}
+
+
+class PartitionedStorage:
+    def __init__(self, path="budget_data", legacy_json=DEFAULT_DATA_FILE):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.manifest = {}
+
+    def manifest_path(self):
+        return os.path.join(self.path, "manifest.json")
+
+    def segment_path(self, kind, month):
+        return os.path.join(self.path, kind, f"{month}.json")
+
+    def _open(self, eager=EAGER_MONTHS):
+        if not os.path.exists(self.manifest_path()):
+            if self.legacy_json and os.path.exists(self.legacy_json):
+                self.migrate_from_json(self.legacy_json)
+            elif not os.path.isdir(self.path):
+                raise FileNotFoundError(self.path)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path()):
+            with open(self.manifest_path(), "r") as f:
+                self.manifest = json.load(f)
+        return PartitionedLedger(self, "income", eager), PartitionedLedger(self, "expenses", eager)
+
+    def migrate_from_json(self, json_path):
+        # One-shot split of an existing budget_data.json into month segments
+        income, expenses = _read_snapshot(json_path)
+        for entry in (*income, *expenses):
+            entry.setdefault("id", new_id())
+        self._replace(income, expenses)
+        return len(income), len(expenses)
+
+    def load(self, path=None):
+        if path and path != self.path:
+            return _read_snapshot(path)
+        return self._open()  # Unsaved changes are dropped with the old ledgers
+
+    def read(self, path=None):
+        if path and path != self.path:
+            return _read_snapshot(path)
+        # Through a separate instance: the live ledgers keep references into
+        # self.manifest, which must stay the one save() writes
+        return PartitionedStorage(self.path, self.legacy_json)._open(eager=0)
+
+    def record(self, op, kind, entry=None):
+        pass  # Ledgers track which months changed
+
+    def save(self, income, expenses, path=None):
+        if path and path != self.path:
+            _write_snapshot(path, income, expenses)
+            return
+        if not isinstance(income, PartitionedLedger):
+            self._replace(income, expenses)
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for ledger in (income, expenses):
+            os.makedirs(os.path.join(self.path, ledger.kind), exist_ok=True)
+            stats = {}
+            for month, segment in ledger.dirty_segments().items():
+                stats[month] = _month_stats(segment)
+                path = self.segment_path(ledger.kind, month)
+                if len(segment):
+                    _write_json(path, list(segment))
+                elif os.path.exists(path):
+                    os.remove(path)
+            ledger.mark_saved(stats)
+        _write_json(self.manifest_path(), self.manifest)
+
+    def _replace(self, income, expenses):
+        # Rewrites the directory from plain rows (first migration, or a tracker
+        # populated before switching to this backend)
+        for kind in ("income", "expenses"):
+            shutil.rmtree(os.path.join(self.path, kind), ignore_errors=True)
+        self.manifest = {}
+        ledgers = PartitionedLedger(self, "income", 0), PartitionedLedger(self, "expenses", 0)
+        ledgers[0].extend(income)
+        ledgers[1].extend(expenses)
+        self.save(*ledgers)
+
+    def backup(self, backup_path):
+        shutil.rmtree(backup_path, ignore_errors=True)
+        shutil.copytree(self.path, backup_path)
+
+    def close(self):
+        pass
+
+
+# ─── FACTORY ───────────────────────────────────────────────────────────────────
+
+BACKENDS = {
+    "json": JsonStorage,
+    "journal": JournalStorage,
+    "sqlite": SQLiteStorage,
+    "partitioned": PartitionedStorage,
+}
+
+
+def open_storage(kind=None, path=None):
+    kind = (kind or os.getenv("PENNYPILOT_STORAGE") or "json").lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {kind}")
+    path = path or os.getenv("PENNYPILOT_DATA_FILE")
+    return BACKENDS[kind](path) if path else BACKENDS[kind]()
+
+
+if __name__ == "__main__":
+    # python storage.py budget_data.json budget_data.db
+    import sys
+    src, dest = (sys.argv[1:3] + [DEFAULT_DATA_FILE, "budget_data.db"][len(sys.argv[1:3]):])[:2]
+    store = SQLiteStorage(dest, legacy_json=None)
+    n_income, n_expenses = store.migrate_from_json(src)
+    store.close()
+    print(f"Migrated {n_income} income and {n_expenses} expenses into {dest}.")
@@ -0,0 +1,53 @@
+# An incrementally synced Forecaster must predict what a fresh one fitted on the
+# same totals does, whatever order the edits arrive in: starting from an empty
+# ledger, backdated rows, and months emptied by deletes included.
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("numpy")
+
+from aggregates import RunningTotals  # noqa: E402
+from forecast import MODELS, Forecaster  # noqa: E402
+
+SEEDS = range(10)
+
+
+def _entry(rng):
+    month = rng.randint(0, 35)
+    kind = rng.choice(["income", "expenses"])
+    sign = 1 if kind == "income" else -1
+    return kind, {"amount": sign * rng.randint(1, 99999) / 100, "date": f"{2020 + month // 12}-{month % 12 + 1:02d}-15",
+                  "category": rng.choice(["salary", "food", "rent", "gas"])}
+
+
+def _assert_same(incremental, fresh):
+    assert incremental["month"] == fresh["month"]
+    assert incremental["model"] == fresh["model"]
+    for kind in ("income", "expenses"):
+        assert incremental[kind] == pytest.approx(fresh[kind], abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_incremental_matches_fresh_fit(seed):
+    rng = random.Random(seed)
+    totals, forecaster, entries = RunningTotals(), Forecaster(), []
+    forecaster.predict(totals)  # Built on an empty ledger
+    for step in range(300):
+        if rng.random() < 0.6 or not entries:
+            for _ in range(rng.randint(1, 4)):  # Several changes per sync, in any month order
+                kind, entry = _entry(rng)
+                totals.add(kind, entry)
+                entries.append((kind, entry))
+        else:
+            kind, entry = entries.pop(rng.randrange(len(entries)))
+            totals.remove(kind, entry)
+        if step % 100 == 99:
+            while entries:  # Delete everything, then start over
+                totals.remove(*entries.pop())
+        model = rng.choice(MODELS)
+        _assert_same(forecaster.predict(totals, model), Forecaster().predict(totals, model))
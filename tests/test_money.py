@@ -0,0 +1,121 @@
+# Totals stay exact: random cent amounts round-trip through every storage
+# backend and the in-memory ledgers, and the running totals always equal the
+# exact Decimal sums and a full recompute. Cases are seeded, so a failure
+# reproduces with the same seed.
+import os
+import random
+import sys
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from money import parse_cents, quantize  # noqa: E402
+from storage import open_storage  # noqa: E402
+from tracker import BudgetTracker  # noqa: E402
+
+SEEDS = range(20)
+BACKENDS = [
+    ("json", "ledger.json", False),
+    ("journal", "ledger.json", False),
+    ("sqlite", "ledger.db", False),
+    ("partitioned", "ledger", False),
+    ("json", "ledger.json", True),  # Columnar in memory
+]
+
+
+def _amount(rng):
+    # Cent amounts in the spellings input arrives in: text, floats, ints
+    cents = rng.choice([rng.randint(1, 99), rng.randint(1, 10 ** 6), rng.randint(1, 10 ** 10)])
+    text = f"{cents // 100}.{cents % 100:02d}"
+    options = [text, float(text)]
+    if cents % 100 == 0:
+        options.append(cents // 100)
+    return rng.choice(options)
+
+
+def _date(rng):
+    return f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def _tracker(tmp_path, backend, name, columnar):
+    if columnar:
+        pytest.importorskip("numpy")
+    return BudgetTracker(None, storage=open_storage(backend, str(tmp_path / name)), columnar=columnar)
+
+
+def _exact(tracker, kind):
+    return sum((Decimal(str(entry["amount"])) for entry in getattr(tracker, kind)), Decimal(0))
+
+
+def _assert_exact(tracker, income, expenses):
+    assert Decimal(str(tracker.view_income())) == income
+    assert Decimal(str(tracker.view_expense())) == expenses
+    # Expenses are negative, so the balance is the plain sum
+    assert Decimal(str(tracker.view_balance())) == income + expenses
+    assert tracker.check_consistency() == []
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parse_cents_matches_decimal(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        text = f"{rng.randint(-10 ** 8, 10 ** 8)}.{rng.randint(0, 999):03d}"
+        expected = int((Decimal(text) * 100).quantize(Decimal(1), rounding="ROUND_HALF_UP"))
+        assert parse_cents(text) == expected
+        assert Decimal(str(quantize(float(text)))) * 100 == expected
+
+
+@pytest.mark.parametrize("backend,name,columnar", BACKENDS)
+@pytest.mark.parametrize("seed", SEEDS[:5])
+def test_round_trip_totals_are_exact(tmp_path, backend, name, columnar, seed):
+    rng = random.Random(seed)
+    tracker = _tracker(tmp_path, backend, name, columnar)
+    income = expenses = Decimal(0)
+    for _ in range(300):
+        amount = _amount(rng)
+        if rng.random() < 0.4:
+            entry = tracker.add_income(amount, "salary", _date(rng))
+            income += Decimal(parse_cents(amount)) / 100
+        else:
+            entry = tracker.add_expense(f"-{amount}" if isinstance(amount, str) else -amount, "food", _date(rng))
+            expenses -= Decimal(parse_cents(amount)) / 100
+        assert entry is not None
+    _assert_exact(tracker, income, expenses)
+    tracker.save_data_quietly()
+
+    reloaded = _tracker(tmp_path, backend, name, columnar)
+    reloaded.load_data()
+    _assert_exact(reloaded, income, expenses)
+    assert _exact(reloaded, "income") == income
+    assert _exact(reloaded, "expenses") == expenses
+
+
+@pytest.mark.parametrize("backend,name,columnar", BACKENDS)
+@pytest.mark.parametrize("seed", SEEDS[:5])
+def test_running_totals_match_recompute_after_edits(tmp_path, backend, name, columnar, seed):
+    rng = random.Random(seed)
+    tracker = _tracker(tmp_path, backend, name, columnar)
+    ids = []
+    for _ in range(400):
+        op = rng.random()
+        if op < 0.5 or not ids:
+            if rng.random() < 0.5:
+                entry = tracker.add_income(_amount(rng), rng.choice(["salary", "gift"]), _date(rng))
+            else:
+                entry = tracker.add_expense(str(-Decimal(str(_amount(rng)))), rng.choice(["food", "rent"]), _date(rng))
+            ids.append(entry["id"])
+        elif op < 0.8:
+            txn_id = rng.choice(ids)
+            kind, entry = tracker.get_transaction(txn_id)
+            amount = Decimal(str(_amount(rng))) * (1 if kind == "income" else -1)
+            assert tracker.update_transaction(txn_id, {"amount": str(amount), "date": _date(rng)}) is not None
+        else:
+            assert tracker.delete_transaction(ids.pop(rng.randrange(len(ids))))
+    _assert_exact(tracker, _exact(tracker, "income"), _exact(tracker, "expenses"))
+    tracker.save_data_quietly()
+
+    reloaded = _tracker(tmp_path, backend, name, columnar)
+    reloaded.load_data()
+    _assert_exact(reloaded, _exact(tracker, "income"), _exact(tracker, "expenses"))
@@ -2,12 +2,40 @@ import json
 from datetime import datetime
 import os
 
+from aggregates import RunningTotals
+from dates import DateParser, parse_date
+from money import parse_cents, to_amount
+from ledger import ListLedger, new_id
+from storage import open_storage
+
+
+EDITABLE_FIELDS = {
+    "income": ("amount", "date", "source", "category"),
+    "expenses": ("amount", "date", "category", "expense_category"),
+}
+TEXT_FIELDS = ("classification", "description", "source", "category", "expense_category")
+
+
+def _text_error(fields):
+    # Message for the first field that should be text but isn't; None if all are
+    for field in TEXT_FIELDS:
+        if fields.get(field) is not None and not isinstance(fields[field], str):
+            return f"Invalid {field}. Please enter text."
+    return None
+
 
 class BudgetTracker:
-    def __init__(self, app=None):
+    def __init__(self, app=None, storage=None, columnar=None):
         self.app = app
-        self.income = []
-        self.expenses = []
+        self.storage = storage or open_storage()
+        # Columnar mode keeps rows in NumPy arrays instead of one dict per row
+        self.columnar = columnar if columnar is not None else os.getenv("PENNYPILOT_COLUMNAR") == "1"
+        self.income = self._as_ledger([])
+        self.expenses = self._as_ledger([])
+        self.totals = RunningTotals()
+        self._forecaster = None  # Built by the first forecast; follows self.totals from then on
+        self.version = 0  # Bumped on every ledger change
+        self._epoch = new_id()[:8]
 
     # ─── INCOME & EXPENSE HANDLERS ─────────────────────────────────────────────
 
@@ -18,12 +46,18 @@ class BudgetTracker:
         date = self._validate_date(date)
         if not date: return
 
-        self.income.append({
+        entry = {
+            "id": new_id(),
             "amount": amount,
             "date": date,
             "source": source,
             "category": category or "general"
-        })
+        }
+        self.income.append(entry)
+        self.totals.add("income", entry)
+        self.storage.record("add", "income", entry)
+        self._changed("add", "income", entry)
+        return entry
 
     def add_expense(self, amount, category, date=None, expense_category=None):
         amount = self._validate_amount(amount, must_be_negative=True)
@@ -32,27 +66,172 @@ class BudgetTracker:
         date = self._validate_date(date)
         if not date: return
 
-        self.expenses.append({
+        entry = {
+            "id": new_id(),
             "amount": amount,
             "date": date,
             "category": category or "misc"
-        })
+        }
+        if expense_category:
+            entry["expense_category"] = expense_category
+        self.expenses.append(entry)
+        self.totals.add("expenses", entry)
+        self.storage.record("add", "expenses", entry)
+        self._changed("add", "expenses", entry)
+        return entry
 
     def add_transaction(self, description, amount, classification=None, date=None, category=None):
         classification = classification or ("income" if float(amount) > 0 else "expense")
 
         if classification.lower() == "income":
-            self.add_income(amount, description, date, category)
+            return self.add_income(amount, description, date, category)
         elif classification.lower() == "expense":
-            self.add_expense(amount, description, date, category)
+            return self.add_expense(amount, description, date, category)
         else:
             self._notify(f"Unknown classification: {classification}")
 
+    def add_transactions(self, rows):
+        # Validates every row before touching the ledger, then commits all of them
+        # or none. Returns (added entries in input order, [{"row": i, "error": msg}])
+        today = datetime.now().strftime("%Y-%m-%d")
+        # The whole date column is parsed up front, in the format most rows use
+        dates = DateParser().parse_many(str(row["date"]) if isinstance(row, dict) and row.get("date") else None
+                                        for row in rows)
+        added, errors = [], []
+        for i, (row, date) in enumerate(zip(rows, dates)):
+            try:
+                added.append(self._bulk_entry(row, date, today))
+            except ValueError as e:
+                errors.append({"row": i, "error": str(e)})
+        if errors:
+            return [], errors
+
+        for kind in ("income", "expenses"):
+            entries = [entry for k, entry in added if k == kind]
+            if not entries:
+                continue
+            self._ledger(kind).extend(entries)
+            for entry in entries:
+                self.totals.add(kind, entry)
+                self.storage.record("add", kind, entry)
+            self._changed("extend", kind)
+        return [entry for _, entry in added], []
+
+    @staticmethod
+    def _bulk_entry(row, date, today):
+        # Same rules as add_income/add_expense, raising instead of notifying
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object.")
+        error = _text_error(row)
+        if error:
+            raise ValueError(error)
+        try:
+            amount = to_amount(parse_cents(row.get("amount")))
+        except ValueError:
+            raise ValueError("Invalid amount. Please enter a valid number.")
+        classification = str(row.get("classification") or ("income" if amount > 0 else "expense")).lower()
+        if classification not in ("income", "expense"):
+            raise ValueError(f"Unknown classification: {classification}")
+        if classification == "income" and amount <= 0:
+            raise ValueError("Income must be a positive number.")
+        if classification == "expense" and amount >= 0:
+            raise ValueError("Expense must be a negative number.")
+        # `date` is the row's date already parsed by add_transactions (None if invalid)
+        if row.get("date") and not date:
+            raise ValueError("Invalid date format. Use YYYY-MM-DD, MM/DD/YYYY or MM/DD/YY.")
+        date = date or today
+
+        if classification == "income":
+            source = row.get("description") or row.get("source")
+            if not source:
+                raise ValueError("Income rows need a description or source.")
+            return "income", {"id": new_id(), "amount": amount, "date": date, "source": source,
+                              "category": row.get("category") or "general"}
+        description = row.get("description") or row.get("category")
+        if not description:
+            raise ValueError("Expense rows need a description or category.")
+        entry = {"id": new_id(), "amount": amount, "date": date, "category": description}
+        expense_category = row.get("expense_category") or (row.get("category") if row.get("description") else None)
+        if expense_category:
+            entry["expense_category"] = expense_category
+        return "expenses", entry
+
+    # ─── LOOKUP BY ID ──────────────────────────────────────────────────────────
+
+    def get_transaction(self, txn_id):
+        # Returns (kind, entry), or (None, None) for an unknown id
+        for kind in ("income", "expenses"):
+            entry = self._ledger(kind).get(txn_id)
+            if entry is not None:
+                return kind, entry
+        return None, None
+
+    def update_transaction(self, txn_id, fields):
+        # fields is a dict, so its keys never collide with txn_id; everything is
+        # validated before the ledger or the totals are touched
+        kind, entry = self.get_transaction(txn_id)
+        if entry is None:
+            return None
+        fields = {k: v for k, v in fields.items() if k in EDITABLE_FIELDS[kind]}
+        error = _text_error(fields)
+        if error:
+            self._notify(error)
+            return None
+        if "amount" in fields:
+            fields["amount"] = self._validate_amount(fields["amount"], must_be_positive=kind == "income",
+                                                     must_be_negative=kind == "expenses")
+            if fields["amount"] is None: return None
+        if "date" in fields:
+            fields["date"] = self._validate_date(fields["date"])
+            if not fields["date"]: return None
+
+        old, new = self._ledger(kind).update(txn_id, fields)
+        self.totals.remove(kind, old)
+        self.totals.add(kind, new)
+        self.storage.record("update", kind, new)
+        self._changed("update", kind, new)
+        return new
+
+    def delete_transaction(self, txn_id):
+        for kind in ("income", "expenses"):
+            entry = self._ledger(kind).delete(txn_id)
+            if entry is not None:
+                self.totals.remove(kind, entry)
+                self.storage.record("delete", kind, entry)
+                self._changed("delete", kind, entry)
+                return True
+        return False
+
+    def clear_data(self, kind=None):
+        for k in ([kind] if kind else ["income", "expenses"]):
+            self._ledger(k).clear()
+        self.totals.clear(kind)
+        self.storage.record("clear", kind)
+        self._changed("clear", kind)
+
+    def query(self, kind, start=None, end=None, category=None, offset=0, limit=None):
+        # A bound that isn't a date is an error, not "no bound"
+        bounds = []
+        for value in (start, end):
+            date = parse_date(value) if value else None
+            if value and date is None:
+                raise ValueError(f"Invalid date filter: {value}")
+            bounds.append(date)
+        start, end = bounds
+        return self._ledger(kind).query(start, end, category, offset, limit)
+
+    def _ledger(self, kind):
+        if kind == "income":
+            return self.income
+        if kind == "expenses":
+            return self.expenses
+        raise ValueError(f"Unknown ledger: {kind}")
+
     # ─── VALIDATION UTILITIES ──────────────────────────────────────────────────
 
     def _validate_amount(self, amount, must_be_positive=False, must_be_negative=False):
         try:
-            amt = float(amount)
+            amt = to_amount(parse_cents(amount))  # Whole cents from here on
             if must_be_positive and amt <= 0:
                 self._notify("Income must be a positive number.")
                 return None
@@ -67,13 +246,23 @@ class BudgetTracker:
     def _validate_date(self, date_str):
         if not date_str:
             return datetime.now().strftime("%Y-%m-%d")
-        for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y"):
-            try:
-                return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
-            except ValueError:
-                continue
-        self._notify("Invalid date format. Use YYYY-MM-DD or MM/DD/YYYY.")
-        return None
+        date = parse_date(date_str)
+        if date is None:
+            self._notify("Invalid date format. Use YYYY-MM-DD, MM/DD/YYYY or MM/DD/YY.")
+        return date
+
+    def ledger_version(self):
+        # Opaque tag that changes whenever the ledger does. Shared storage keeps the
+        # counter in the database so every process reports the same version.
+        if hasattr(self.storage, "version"):
+            return f"{self.storage.epoch()}-{self.storage.version()}"
+        return f"{self._epoch}-{self.version}"
+
+    def _changed(self, op, kind=None, entry=None):
+        self.version += 1
+        # Lets a UI apply each change as a diff instead of re-reading the ledger
+        if self.app and hasattr(self.app, "on_ledger_changed"):
+            self.app.on_ledger_changed(op, kind, entry)
 
     def _notify(self, message):
         if self.app and hasattr(self.app, "show_notification"):
@@ -83,14 +272,11 @@ class BudgetTracker:
 
     # ─── FILE OPERATIONS ───────────────────────────────────────────────────────
 
-    def save_data(self, filename="budget_data.json"):
+    def save_data(self, filename=None):
         def do_save(create_backup):
             if create_backup:
                 self.create_backup()
-            self._write_json(filename, {
-                "income": self.income,
-                "expenses": self.expenses
-            })
+            self._write_storage(filename)
             self._notify("Data saved successfully.")
 
         if self.app and hasattr(self.app, "ask_backup_confirmation"):
@@ -98,25 +284,24 @@ class BudgetTracker:
         else:
             do_save(create_backup=False)
 
-    def save_data_quietly(self, filename="budget_data.json"):
-        self._write_json(filename, {
-            "income": self.income,
-            "expenses": self.expenses
-        })
+    def save_data_quietly(self, filename=None):
+        self._write_storage(filename)
 
-    def _write_json(self, path, data):
+    def _write_storage(self, path=None):
         try:
-            with open(path, "w") as f:
-                json.dump(data, f, indent=2)
+            self.storage.save(self.income, self.expenses, path)
         except Exception as e:
             self._notify(f"Error saving data: {e}")
 
-    def load_data(self, filename="budget_data.json"):
+    def load_data(self, filename=None):
+        filename = filename or self.storage.path
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-            self.income = data.get("income", [])
-            self.expenses = data.get("expenses", [])
+            income, expenses = self.storage.load(filename)
+            self.income, self.expenses = self._as_ledger(income), self._as_ledger(expenses)
+            if self.income.ensure_ids() + self.expenses.ensure_ids() and filename == self.storage.path:
+                self._persist_ids()
+            self.totals.rebuild(self.income, self.expenses)
+            self._changed("load")
             self._notify(f"Loaded {len(self.income)} income and {len(self.expenses)} expenses.")
         except FileNotFoundError:
             self._notify(f"File not found: {filename}")
@@ -125,7 +310,32 @@ class BudgetTracker:
         except Exception as e:
             self._notify(f"Error loading data: {e}")
 
-    def create_backup(self, current="budget_data.json", backup="budget_data_backup.json"):
+    def _persist_ids(self):
+        # Ledgers saved before transactions had ids get them once, on first load
+        compact = getattr(self.storage, "compact", None)
+        try:
+            (compact or self.storage.save)(self.income, self.expenses)
+        except Exception as e:
+            self._notify(f"Error saving transaction ids: {e}")
+
+    def _as_ledger(self, rows):
+        if hasattr(rows, "query"):
+            return rows
+        if not self.columnar:
+            return ListLedger(rows)
+        from columnar import ColumnarLedger  # Imports numpy, so only in columnar mode
+        return ColumnarLedger(rows)
+
+    def create_backup(self, current=None, backup=None):
+        current = current or self.storage.path
+        root, ext = os.path.splitext(current)
+        backup = backup or f"{root}_backup{ext}"
+        if hasattr(self.storage, "backup"):
+            try:
+                self.storage.backup(backup)
+            except Exception as e:
+                self._notify(f"Error creating backup: {e}")
+            return
         if os.path.exists(backup):
             try:
                 os.remove(backup)
@@ -137,14 +347,14 @@ class BudgetTracker:
             except Exception as e:
                 self._notify(f"Error creating backup: {e}")
 
-    def load_transactions(self, filename="budget_data.json"):
+    def load_transactions(self, filename=None):
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
+            income, expenses = self.storage.read(filename or self.storage.path)
             transactions = []
 
-            for i in data.get("income", []):
+            for i in income:
                 transactions.append({
+                    "id": i.get("id"),
                     "date": i["date"],
                     "description": i.get("source", "income"),
                     "amount": i["amount"],
@@ -152,12 +362,13 @@ class BudgetTracker:
                     "classification": "income"
                 })
 
-            for e in data.get("expenses", []):
+            for e in expenses:
                 transactions.append({
+                    "id": e.get("id"),
                     "date": e["date"],
                     "description": e.get("category", "expense"),
                     "amount": e["amount"],
-                    "category": e.get("category", "expense"),
+                    "category": e.get("expense_category", e.get("category", "expense")),
                     "classification": "expense"
                 })
             print(f"Loaded {len(transactions)} transactions.")
@@ -169,23 +380,58 @@ class BudgetTracker:
     # ─── METRICS ───────────────────────────────────────────────────────────────
 
     def view_income(self):
-        return sum(item["amount"] for item in self.income)
+        return self.totals.total("income")
 
     def view_expense(self):
-        return sum(item["amount"] for item in self.expenses)
+        return self.totals.total("expenses")
 
     def view_balance(self):
-        return self.view_income() - self.view_expense()
+        # Expenses are stored negative, so the balance is the plain sum of both
+        return to_amount(self.totals.total_cents("income") + self.totals.total_cents("expenses"))
 
     def get_monthly_averages(self):
-        def aggregate_by_month(entries):
-            result = {}
-            for entry in entries:
-                month = entry["date"][:7]  # YYYY-MM
-                result.setdefault(month, []).append(entry["amount"])
-            return {month: sum(v) / len(v) for month, v in result.items()}
+        return {
+            "income_avg": self.totals.monthly_averages("income"),
+            "expense_avg": self.totals.monthly_averages("expenses")
+        }
 
+    def get_category_totals(self):
         return {
-            "income_avg": aggregate_by_month(self.income),
-            "expense_avg": aggregate_by_month(self.expenses)
+            "income": self.totals.category_totals("income"),
+            "expenses": self.totals.category_totals("expenses")
         }
+
+    def forecast(self, model="auto"):
+        # Next month's income and spending per category, and the balance they lead
+        # to; model is one of forecast.MODELS. Raises ImportError without numpy.
+        if self._forecaster is None:
+            from forecast import Forecaster  # Imports numpy, so only once a forecast is asked for
+            self._forecaster = Forecaster()
+        predicted = self._forecaster.predict(self.totals, model)
+        income, expenses = sum(predicted["income"].values()), sum(predicted["expenses"].values())
+        current = self.totals.total_cents("income") + self.totals.total_cents("expenses")  # view_balance()
+        categories = {}
+        for kind in ("income", "expenses"):
+            merged = categories[kind] = {}
+            for category, value in predicted[kind].items():
+                name = "uncategorized" if category is None else category  # JSON keys must be strings
+                merged[name] = merged.get(name, 0) + value
+        return {
+            "month": predicted["month"],
+            "model": predicted["model"],
+            "income": to_amount(round(income)),
+            "expenses": to_amount(round(expenses)),
+            "balance": to_amount(current + round(income) + round(expenses)),
+            "current_balance": to_amount(current),
+            "categories": {kind: {c: to_amount(round(v)) for c, v in merged.items()}
+                           for kind, merged in categories.items()},
+        }
+
+    def forecast_next_month_balance(self, model="auto"):
+        return self.forecast(model)["balance"]
+
+    def check_consistency(self):
+        # Recompute every running total from the ledger; returns a list of mismatches
+        fresh = RunningTotals()
+        fresh.rebuild(self.income, self.expenses)
+        return self.totals.diff(fresh)
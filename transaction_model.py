@@ -0,0 +1,281 @@
+# Model/view backing for the main window log panes and the Manage Transactions table
+#
+# Rows are read straight from the tracker's in-memory ledgers and only
+# materialized for the rows the view actually paints, a page at a time.
+# Sorting is done once over a key column (not through per-cell data() calls)
+# and stored as a row permutation, so the widget is never rebuilt.
+from PySide6.QtCore import QAbstractListModel, QAbstractProxyModel, QAbstractTableModel, QModelIndex, Qt
+
+COLUMNS = ["Date", "Description", "Amount", "Category"]
+PAGE_SIZE = 256
+MAX_PAGES = 256
+
+
+def _values(kind, entry):
+    if kind == "income":
+        return [entry["date"], entry.get("source", "income"), entry["amount"], entry.get("category", "income")]
+    return [entry["date"], entry.get("category", "expense"), entry["amount"],
+            entry.get("expense_category", entry.get("category", "expense"))]
+
+
+def _log_line(kind, entry):
+    if kind == "income":
+        return f"{entry['date']}: ${entry['amount']} ({entry.get('source')})"
+    return f"{entry['date']}: ${entry['amount']} ({entry.get('category')})"
+
+
+class LedgerLogModel(QAbstractListModel):
+    # One line per transaction of a single kind, in ledger order. Tracker changes
+    # arrive as diffs (apply()), so adding or deleting a row touches one row of
+    # the view; only a full load resets the model. Lazy ledgers (partitioned
+    # storage) are never read in full: rows are counted with len() and located
+    # with index_of(), and changes other than an add reset the model.
+    def __init__(self, tracker, kind, parent=None):
+        super().__init__(parent)
+        self.tracker = tracker
+        self.kind = kind
+        self._pages = {}
+        self._ids = []  # Row -> transaction id, to find the row of a deleted entry
+        self._count = 0
+        self.refresh()
+
+    def _ledger(self):
+        return self.tracker._ledger(self.kind)
+
+    def _entry(self, row):
+        page_no = row // PAGE_SIZE
+        page = self._pages.get(page_no)
+        if page is None:
+            if len(self._pages) >= MAX_PAGES:
+                self._pages.clear()
+            start = page_no * PAGE_SIZE
+            page = self._pages[page_no] = self._ledger()[start:start + PAGE_SIZE]
+        return page[row % PAGE_SIZE]
+
+    def _invalidate(self, row):
+        # Pages at or after a changed row may now hold stale rows
+        first = row // PAGE_SIZE
+        for page_no in [p for p in self._pages if p >= first]:
+            del self._pages[page_no]
+
+    def refresh(self):
+        self.beginResetModel()
+        self._pages.clear()
+        ledger = self._ledger()
+        self._ids = None if getattr(ledger, "lazy", False) else [e.get("id") for e in ledger]
+        self._count = len(ledger) if self._ids is None else 0
+        self.endResetModel()
+
+    def apply(self, op, entry=None):
+        if self._ids is None:
+            self._apply_lazy(op, entry)
+        elif op == "add":
+            row = len(self._ids)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._ids.append(entry["id"])
+            self._invalidate(row)
+            self.endInsertRows()
+        elif op == "delete":
+            row = self._ids.index(entry["id"])
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._ids[row]
+            self._invalidate(row)
+            self.endRemoveRows()
+        elif op == "update":
+            row = self._ids.index(entry["id"])
+            self._invalidate(row)
+            self.dataChanged.emit(self.index(row), self.index(row))
+        else:  # "clear" or "load"
+            self.refresh()
+
+    def _apply_lazy(self, op, entry):
+        if op != "add":
+            self.refresh()
+            return
+        row = self._ledger().index_of(entry["id"])
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._count += 1
+        self._invalidate(row)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count if self._ids is None else len(self._ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return _log_line(self.kind, self._entry(index.row()))
+
+
+class TransactionTableModel(QAbstractTableModel):
+    def __init__(self, tracker, parent=None):
+        super().__init__(parent)
+        self.tracker = tracker
+        self._pages = {}
+        self._order = None  # Sorted permutation of source rows, None = ledger order
+        self._sort = None
+        self._n_income = len(tracker.income)
+        self._n_expenses = len(tracker.expenses)
+
+    # ─── ROW ACCESS ────────────────────────────────────────────────────────────
+
+    def ledger_row(self, row):
+        # Position in ledger order (income rows first, then expenses) for a model row
+        return row if self._order is None else self._order[row]
+
+    def transaction(self, row):
+        # Returns (kind, entry) for a model row
+        row = self.ledger_row(row)
+        if row < self._n_income:
+            return "income", self._entry(self.tracker.income, "income", row)
+        return "expenses", self._entry(self.tracker.expenses, "expenses", row - self._n_income)
+
+    def _entry(self, ledger, kind, row):
+        page_no = row // PAGE_SIZE
+        page = self._pages.get((kind, page_no))
+        if page is None:
+            if len(self._pages) >= MAX_PAGES:
+                self._pages.clear()
+            start = page_no * PAGE_SIZE
+            page = self._pages[(kind, page_no)] = ledger[start:start + PAGE_SIZE]
+        return page[row % PAGE_SIZE]
+
+    def values(self, row):
+        return _values(*self.transaction(row))
+
+    def iter_column(self, column):
+        # Sequential pass over every row in source order; far cheaper than indexing
+        for kind, ledger in (("income", self.tracker.income), ("expenses", self.tracker.expenses)):
+            if column == 0:
+                yield from (e["date"] for e in ledger)
+            elif column == 2:
+                yield from (e["amount"] for e in ledger)
+            else:
+                for entry in ledger:
+                    yield _values(kind, entry)[column]
+
+    def iter_text(self):
+        for kind, ledger in (("income", self.tracker.income), ("expenses", self.tracker.expenses)):
+            for entry in ledger:
+                date, description, amount, category = _values(kind, entry)
+                yield f"{date} {description} {amount} {category}".lower()
+
+    def refresh(self):
+        self.beginResetModel()
+        self._pages.clear()
+        self._order = None
+        self._n_income = len(self.tracker.income)
+        self._n_expenses = len(self.tracker.expenses)
+        self.endResetModel()
+        if self._sort:
+            self.sort(*self._sort)
+
+    # ─── QT MODEL INTERFACE ────────────────────────────────────────────────────
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._n_income + self._n_expenses
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return str(self.values(index.row())[index.column()])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            self._order, self._sort = None, None
+        else:
+            keys = list(self.iter_column(column))
+            self._order = sorted(range(len(keys)), key=keys.__getitem__, reverse=order == Qt.DescendingOrder)
+            self._sort = (column, order)
+        self.layoutChanged.emit()
+
+
+class TransactionFilterProxy(QAbstractProxyModel):
+    # Row-index proxy: filtering builds a list of matching source rows in one
+    # sequential pass, and Qt only ever asks about the rows on screen. (A
+    # QSortFilterProxyModel calls back into Python once per row on every change.)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._needle = ""
+        self._mask = None   # Match flags in ledger order, None = no filter
+        self._rows = None   # Visible source rows, None = all of them
+        self._inverse = None
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(self._refilter)
+        model.layoutChanged.connect(self._rebuild)
+        self._refilter()
+
+    def set_filter_text(self, text):
+        self._needle = text.strip().lower()
+        self._refilter()
+
+    def _refilter(self):
+        needle = self._needle
+        self._mask = bytearray(needle in row for row in self.sourceModel().iter_text()) if needle else None
+        self._rebuild()
+
+    def _rebuild(self):
+        self.beginResetModel()
+        source = self.sourceModel()
+        if self._mask is None:
+            self._rows = None
+        else:
+            mask, ledger_row = self._mask, source.ledger_row
+            self._rows = [r for r in range(source.rowCount()) if mask[ledger_row(r)]]
+        self._inverse = None
+        self.endResetModel()
+
+    # ─── QT PROXY INTERFACE ────────────────────────────────────────────────────
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.sourceModel().rowCount() if self._rows is None else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not (0 <= row < self.rowCount() and 0 <= column < self.columnCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row() if self._rows is None else self._rows[proxy_index.row()]
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._rows is None:
+            return self.index(source_index.row(), source_index.column())
+        if self._inverse is None:
+            self._inverse = {r: i for i, r in enumerate(self._rows)}
+        row = self._inverse.get(source_index.row())
+        return QModelIndex() if row is None else self.index(row, source_index.column())
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role)
+        return super().headerData(section, orientation, role)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
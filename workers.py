@@ -0,0 +1,62 @@
+# Background workers so GPT calls and imports never block the Qt event loop
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class WorkerSignals(QObject):
+    progress = Signal(object)
+    result = Signal(object)
+    error = Signal(str)
+    finished = Signal()
+
+
+class Worker(QRunnable):
+    # Runs fn(*args, **kwargs) on the global thread pool. With controls=True the
+    # function also receives progress= and cancel= callbacks; anything passed to
+    # progress() is delivered to the UI thread through signals.progress.
+    def __init__(self, fn, *args, controls=False, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancelled = False
+        if controls:
+            self.kwargs.update(progress=self.signals.progress.emit, cancel=self.is_cancelled)
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            if not self._cancelled:
+                self.signals.error.emit(str(e))
+        else:
+            if not self._cancelled:
+                self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class WorkerPool:
+    # Keeps workers (and their signal objects) alive until they finish
+    def __init__(self):
+        self.pool = QThreadPool.globalInstance()
+        self._active = set()
+
+    def start(self, worker):
+        self._active.add(worker)
+        worker.signals.finished.connect(lambda: self._active.discard(worker))
+        self.pool.start(worker)
+        return worker
+
+    def cancel_all(self):
+        for worker in list(self._active):
+            worker.cancel()